@@ -56,6 +56,9 @@ resource "aws_iam_policy" "lambda_dynamodb_eventbridge_s3_policy" {
         Resource = [
           aws_dynamodb_table.webhooks_table.arn,
           "${aws_dynamodb_table.webhooks_table.arn}/*",
+          aws_dynamodb_table.outbox_table.arn,
+          "${aws_dynamodb_table.outbox_table.arn}/*",
+          aws_dynamodb_table.sweep_leases_table.arn,
           aws_scheduler_schedule_group.user_schedules_group.arn,
           "${aws_scheduler_schedule_group.user_schedules_group.arn}/*",
           "arn:aws:scheduler:${var.aws_region}:${data.aws_caller_identity.current.account_id}:schedule/${aws_scheduler_schedule_group.user_schedules_group.name}/*",
@@ -63,6 +66,12 @@ resource "aws_iam_policy" "lambda_dynamodb_eventbridge_s3_policy" {
           "${aws_s3_bucket.splat_notifyer_data_cache.arn}", # Added S3 resource for data.json
           aws_iam_role.eventbridge_scheduler_role.arn
         ]
+      },
+      {
+        # /submit-webhook hands the initial notifications, and the sweep coordinator its shards, to the notifier asynchronously
+        Action   = "lambda:InvokeFunction",
+        Effect   = "Allow",
+        Resource = aws_lambda_function.notifyer_update_lambda.arn
       }
     ]
   })
@@ -130,6 +139,75 @@ resource "aws_dynamodb_table" "webhooks_table" {
   }
 }
 
+# DynamoDB Table for the notification outbox (rendered messages waiting for Discord delivery)
+resource "aws_dynamodb_table" "outbox_table" {
+  name         = "splat-notifyer-outbox"
+  billing_mode = "PAY_PER_REQUEST"
+
+  hash_key = "dedup_key"
+
+  attribute {
+    name = "dedup_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "status"
+    type = "S"
+  }
+
+  attribute {
+    name = "next_attempt_at"
+    type = "N"
+  }
+
+  global_secondary_index {
+    name            = "status-next_attempt_at-index"
+    hash_key        = "status"
+    range_key       = "next_attempt_at"
+    projection_type = "ALL"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = {
+    Environment = "development" # Or desired environment
+    Project     = "splat-notifyer"
+  }
+}
+
+# DynamoDB Table for the shard leases of coordinated batch sweeps
+resource "aws_dynamodb_table" "sweep_leases_table" {
+  name         = "splat-notifyer-sweep-leases"
+  billing_mode = "PAY_PER_REQUEST"
+
+  hash_key  = "sweep_id"
+  range_key = "shard"
+
+  attribute {
+    name = "sweep_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "shard"
+    type = "N"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = {
+    Environment = "development" # Or desired environment
+    Project     = "splat-notifyer"
+  }
+}
+
 # Lambda Functions (excluding data_fetcher_lambda)
 resource "aws_lambda_function" "api_gateway_lambda" {
   function_name    = "splat-notifyer-api-gateway"
@@ -145,6 +223,10 @@ resource "aws_lambda_function" "api_gateway_lambda" {
       DYNAMODB_TABLE_NAME         = aws_dynamodb_table.webhooks_table.name
       DESTINATION_LAMBDA_ARN     = aws_lambda_function.notifyer_update_lambda.arn
       EVENTBRIDGE_ROLE_ARN       = aws_iam_role.eventbridge_scheduler_role.arn
+      PER_WEBHOOK_SCHEDULES      = "false" # New subscribers are notified by the batch sweep
+      OUTBOX_TABLE_NAME          = aws_dynamodb_table.outbox_table.name
+      NOTIFY_MODE                = "incremental"
+      LOG_DEBUG_SAMPLE_RATE      = "0.01" # Metrics are always emitted; DEBUG logs only for sampled invocations
     }
   }
 }
@@ -156,13 +238,66 @@ resource "aws_lambda_function" "notifyer_update_lambda" {
   role             = aws_iam_role.lambda_exec_role.arn
   filename         = data.archive_file.api_lambda_archive.output_path
   source_code_hash = data.archive_file.api_lambda_archive.output_base64sha256
+  timeout          = 300 # A sweep worker keeps claiming shards until none are left or its time runs out
   environment {
     variables = {
-      S3_BUCKET_NAME = aws_s3_bucket.splat_notifyer_data_cache.bucket
+      S3_BUCKET_NAME                  = aws_s3_bucket.splat_notifyer_data_cache.bucket
+      DYNAMODB_TABLE_NAME             = aws_dynamodb_table.webhooks_table.name
+      EVENTBRIDGE_SCHEDULE_GROUP_NAME = aws_scheduler_schedule_group.user_schedules_group.name
+      OUTBOX_TABLE_NAME               = aws_dynamodb_table.outbox_table.name
+      SWEEP_LEASE_TABLE_NAME          = aws_dynamodb_table.sweep_leases_table.name
+      SWEEP_SHARDS                    = "8"
+      SWEEP_LEASE_SECONDS             = "330" # The timeout above plus a margin
+      NOTIFY_MODE                     = "incremental"
+      LOG_DEBUG_SAMPLE_RATE           = "0.01"
     }
   }
 }
 
+# Batch sweep: a coordinator run shards the sweep over every subscriber without a per-webhook schedule
+# and starts one worker invocation per shard. The later runs in the same interval only start workers
+# for shards that failed or whose lease expired.
+resource "aws_cloudwatch_event_rule" "notifyer_batch_schedule_rule" {
+  name                = "splat-notifyer-batch-sweep-schedule-rule"
+  description         = "Triggers the sweep coordinator every even hour 10, 25 and 40 minutes past the hour (UTC)"
+  schedule_expression = "cron(10,25,40 0/2 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "notifyer_batch_target" {
+  rule  = aws_cloudwatch_event_rule.notifyer_batch_schedule_rule.name
+  arn   = aws_lambda_function.notifyer_update_lambda.arn
+  input = jsonencode({ mode = "coordinator" })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_batch_sweep" {
+  statement_id  = "AllowEventBridgeInvokeBatchSweep"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.notifyer_update_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.notifyer_batch_schedule_rule.arn
+}
+
+# Outbox drain: retries deliveries that earlier runs deferred because of rate limits or errors
+resource "aws_cloudwatch_event_rule" "notifyer_drain_schedule_rule" {
+  name                = "splat-notifyer-outbox-drain-schedule-rule"
+  description         = "Triggers the outbox drain stage every 5 minutes"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "notifyer_drain_target" {
+  rule  = aws_cloudwatch_event_rule.notifyer_drain_schedule_rule.name
+  arn   = aws_lambda_function.notifyer_update_lambda.arn
+  input = jsonencode({ mode = "drain" })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_outbox_drain" {
+  statement_id  = "AllowEventBridgeInvokeOutboxDrain"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.notifyer_update_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.notifyer_drain_schedule_rule.arn
+}
+
 # EventBridge Schedule Group
 resource "aws_scheduler_schedule_group" "user_schedules_group" {
   name = "user-schedules"
@@ -175,8 +310,24 @@ resource "aws_scheduler_schedule_group" "user_schedules_group" {
 # Archive files for Lambda functions
 data "archive_file" "api_lambda_archive" {
   type        = "zip"
-  source_file = "./files/api.py"
   output_path = "./.build/api_lambda.zip"
+
+  dynamic "source" {
+    for_each = setsubtract(fileset("./files", "*.py"), ["data_fetcher.py"])
+    content {
+      content  = file("./files/${source.value}")
+      filename = source.value
+    }
+  }
+
+  # The catalogs the web app serves, which the payload validator checks submitted ids against
+  dynamic "source" {
+    for_each = ["maps.json", "batle-modes.json"]
+    content {
+      content  = file("../${source.value}")
+      filename = source.value
+    }
+  }
 }
 
 # ACM Certificate for API Gateway Custom Domain
@@ -244,6 +395,13 @@ resource "aws_apigatewayv2_integration" "submit_webhook_integration" {
   integration_uri    = aws_lambda_function.api_gateway_lambda.invoke_arn
 }
 
+resource "aws_apigatewayv2_integration" "preview_rules_integration" {
+  api_id             = aws_apigatewayv2_api.http_api.id
+  integration_type   = "AWS_PROXY"
+  integration_method = "POST"
+  integration_uri    = aws_lambda_function.api_gateway_lambda.invoke_arn
+}
+
 # API Gateway Routes
 resource "aws_apigatewayv2_route" "check_webhook_route" {
   api_id    = aws_apigatewayv2_api.http_api.id
@@ -257,6 +415,12 @@ resource "aws_apigatewayv2_route" "submit_webhook_route" {
   target    = "integrations/${aws_apigatewayv2_integration.submit_webhook_integration.id}"
 }
 
+resource "aws_apigatewayv2_route" "preview_rules_route" {
+  api_id    = aws_apigatewayv2_api.http_api.id
+  route_key = "POST /preview-rules"
+  target    = "integrations/${aws_apigatewayv2_integration.preview_rules_integration.id}"
+}
+
 
 # Lambda Permissions for API Gateway
 resource "aws_lambda_permission" "allow_api_gateway" {
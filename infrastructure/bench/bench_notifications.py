@@ -0,0 +1,216 @@
+"""Offline benchmark for the notifier's matching and rendering pipeline.
+
+Runs the real api.py functions against the bundled schedules.json with synthetic subscriber
+populations, a local SQLite outbox and a stubbed Discord sender, and reports per-stage timings,
+throughput and peak memory. No AWS or Discord calls are made.
+
+    python infrastructure/bench/bench_notifications.py --subscribers 1000 10000 100000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+LAMBDA_DIR = os.path.join(REPO_ROOT, "infrastructure", "files")
+
+# Keep the import-time schedule load from reaching real AWS credentials or the network
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ["AWS_EC2_METADATA_DISABLED"] = "true"
+os.environ["AWS_SHARED_CREDENTIALS_FILE"] = os.devnull
+os.environ["AWS_CONFIG_FILE"] = os.devnull
+for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN", "AWS_PROFILE"):
+    os.environ.pop(name, None)
+os.environ["OUTBOX_SQLITE_PATH"] = ":memory:"
+sys.path.insert(0, LAMBDA_DIR)
+
+import api # noqa: E402
+import data_fetcher # noqa: E402
+from discord_delivery import DeliveryResult # noqa: E402
+from outbox import Outbox, SQLiteOutboxBackend # noqa: E402
+from subscription_store import SubscriptionStore # noqa: E402
+
+MATCH_TYPES = ["X-Battle", "Series", "Open"]
+NOTIFY_TYPES = ["at-least-one", "two-same-rotation"]
+TIME_SLOTS = [f"{hour:02d}:00Z" for hour in range(0, 24, 2)]
+
+class StubDeliveryEngine:
+    """Accepts every payload without any network I/O."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_many(self, deliveries, max_wait=None):
+        results = []
+        for _webhook_url, _payload in deliveries:
+            self.sent += 1
+            results.append(DeliveryResult(True, 204, 1, None, None, False))
+        return results
+
+def load_catalog(name):
+    with open(os.path.join(REPO_ROOT, name)) as f:
+        return list(json.load(f))
+
+def make_population(count, max_rules, seed):
+    """Builds /submit-webhook bodies with varying rule counts, map selections and notify types."""
+    rng = random.Random(seed)
+    stage_ids = load_catalog("maps.json")
+    mode_ids = load_catalog("batle-modes.json")
+    # A handful of shared messages, like real users who keep the default text
+    messages = [f"Rotation alert {i}" for i in range(8)]
+
+    population = []
+    for i in range(count):
+        rules = []
+        for _ in range(rng.randint(1, max_rules)):
+            enabled_modes = rng.sample(mode_ids, rng.randint(1, len(mode_ids)))
+            rules.append({
+                "notificationMessage": rng.choice(messages),
+                "matchType": rng.choice(MATCH_TYPES),
+                "timeSlots": sorted(rng.sample(TIME_SLOTS, rng.randint(1, len(TIME_SLOTS)))),
+                "battleModes": {mode_id: mode_id in enabled_modes for mode_id in mode_ids},
+                "maps": {
+                    mode_id: {
+                        "notifyType": rng.choice(NOTIFY_TYPES),
+                        "selectedMaps": rng.sample(stage_ids, rng.randint(1, len(stage_ids)))
+                    }
+                    for mode_id in enabled_modes
+                }
+            })
+        population.append({"webhookUrl": f"https://discord.com/api/webhooks/{i}/bench-token", "rules": rules})
+    return population
+
+class StageTimer:
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def run(self, name, items, func):
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        peak = None
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.stages.append({
+            "stage": name,
+            "seconds": elapsed,
+            "items": items,
+            "items_per_second": items / elapsed if elapsed and items > 1 else None,
+            "peak_bytes": peak
+        })
+        return result
+
+def bench_population(raw_schedules, population, trace_memory):
+    timer = StageTimer(trace_memory)
+
+    raw_document = timer.run("schedule json.loads (raw)", 1, lambda: json.loads(raw_schedules))
+    nodes = timer.run("generalize raw data.json", 1, lambda: api.generalize_schedule_data(raw_document))
+    snapshot_text = json.dumps(data_fetcher.build_schedule_snapshot(raw_document), separators=(',', ':'))
+    timer.run("load + generalize snapshot", 1, lambda: api.generalize_schedule_snapshot(json.loads(snapshot_text)))
+
+    def validate_all():
+        invalid = sum(1 for body in population if not api.validate_rules_payload(body)[0])
+        if invalid:
+            raise RuntimeError(f"{invalid} synthetic payloads failed validation")
+    timer.run("validate_rules_payload", len(population), validate_all)
+
+    # Evaluate every node in the bundled schedule, like a sweep right after a fetch
+    timestamp = api.datetime.fromtimestamp(nodes[-1].start - 1, api.timezone.utc).isoformat()
+
+    def match_all():
+        matched = []
+        for body in population:
+            payload = {"webhook_url": body["webhookUrl"], "data": {"rules": body["rules"]}}
+            matched.append((body["webhookUrl"], api.build_notifications(payload, timestamp, nodes)))
+        return matched
+    matched = timer.run("match + render", len(population), match_all)
+    message_count = sum(len(notifications) for _webhook_url, notifications in matched)
+
+    canonical_rules = [api.canonicalize_rules(body["rules"]) for body in population]
+
+    def store_match_all():
+        store = SubscriptionStore()
+        for rules in canonical_rules:
+            store.add(rules)
+        matches = store.match(api.upcoming_nodes(nodes, api.parse_epoch(timestamp)))
+        return [api.render_notifications(subscriber_matches) for subscriber_matches in matches]
+    store_rendered = timer.run("store match + render", len(population), store_match_all)
+    if [notifications for _webhook_url, notifications in matched] != store_rendered:
+        raise RuntimeError("SubscriptionStore matches differ from build_notifications")
+
+    packed = timer.run("pack messages", len(population), lambda: [
+        (webhook_url, api.pack_notifications(notifications)) for webhook_url, notifications in matched
+    ])
+    payload_count = sum(len(messages) for _webhook_url, messages in packed)
+
+    outbox = Outbox(SQLiteOutboxBackend())
+
+    def enqueue_all():
+        for webhook_url, messages in packed:
+            for message in messages:
+                outbox.enqueue(webhook_url, message.payload, message.node_starts)
+    timer.run("outbox enqueue (sqlite)", payload_count, enqueue_all)
+
+    engine = StubDeliveryEngine()
+    timer.run("outbox drain (stub sender)", payload_count, lambda: outbox.drain(engine, batch_size=1000))
+    if engine.sent != payload_count:
+        raise RuntimeError(f"Stub sender received {engine.sent} of {payload_count} payloads")
+
+    return {
+        "subscribers": len(population),
+        "rules": sum(len(body["rules"]) for body in population),
+        "messages": message_count,
+        "payloads": payload_count,
+        "schedule_nodes": len(nodes),
+        "stages": timer.stages
+    }
+
+def print_report(report):
+    print(f"\n{report['subscribers']} subscribers, {report['rules']} rules, "
+          f"{report['schedule_nodes']} schedule nodes, {report['messages']} messages in {report['payloads']} payloads")
+    print(f"  {'stage':<30} {'seconds':>10} {'items/s':>14} {'peak MiB':>10}")
+    for stage in report["stages"]:
+        rate = f"{stage['items_per_second']:,.0f}" if stage["items_per_second"] else "-"
+        peak = f"{stage['peak_bytes'] / 2**20:.1f}" if stage["peak_bytes"] is not None else "-"
+        print(f"  {stage['stage']:<30} {stage['seconds']:>10.4f} {rate:>14} {peak:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-rules", type=int, default=5, help="Upper bound of rules per subscriber")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--schedules", default=os.path.join(REPO_ROOT, "schedules.json"))
+    parser.add_argument("--trace-memory", action="store_true", help="Measure per-stage peak memory with tracemalloc (slower)")
+    parser.add_argument("--json", dest="json_path", help="Also write the reports to this file")
+    args = parser.parse_args()
+
+    with open(args.schedules, "rb") as f:
+        raw_schedules = f.read()
+
+    reports = []
+    for count in args.subscribers:
+        population = make_population(count, args.max_rules, args.seed)
+        report = bench_population(raw_schedules, population, args.trace_memory)
+        print_report(report)
+        reports.append(report)
+        del population
+
+    max_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\nProcess peak RSS: {max_rss_kib / 1024:.1f} MiB")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"reports": reports, "max_rss_kib": max_rss_kib}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""Load test for the API and notifier handlers against local stand-ins for AWS and Discord.
+
+Concurrent clients call the real api.handler with /check-webhook and /submit-webhook requests.
+Asynchronous notifier invocations run the real api.lambda_handler in-process. S3, DynamoDB,
+EventBridge Scheduler and Lambda are in-memory stand-ins with configurable latency, and Discord
+is a local HTTP server that enforces per-webhook rate limits and can answer with global 429
+storms. Reports latency percentiles, throughput and error rates per route, plus what each
+stand-in saw (conditional write failures, schedule conflicts, 429s).
+
+    python infrastructure/bench/load_test.py --clients 32 --duration 30 --webhooks 200 --check-ratio 0.7
+"""
+import argparse
+import contextlib
+import http.server
+import io
+import json
+import os
+import random
+import re
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+from bench_notifications import REPO_ROOT, api, data_fetcher, make_population # noqa: E402
+from botocore.exceptions import ClientError # noqa: E402
+
+ROTATION_SECONDS = 2 * 3600
+
+def client_error(code, operation, status=400):
+    return ClientError({"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, operation)
+
+class Latency:
+    """Sleeps for a uniformly jittered delay around mean_ms, standing in for a network round trip."""
+
+    def __init__(self, mean_ms):
+        self.mean_ms = mean_ms
+
+    def wait(self):
+        if self.mean_ms > 0:
+            time.sleep(random.uniform(0.5, 1.5) * self.mean_ms / 1000)
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+class LocalS3:
+    def __init__(self, objects, latency):
+        self.objects = objects # key -> bytes
+        self.latency = latency
+        self.counters = Counters()
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.latency.wait()
+        self.counters.add("get_object")
+        body = self.objects.get(Key)
+        if body is None:
+            raise client_error("NoSuchKey", "GetObject", 404)
+        etag = f'"{hash(body) & 0xffffffff:08x}"'
+        if IfNoneMatch == etag:
+            self.counters.add("not_modified")
+            raise client_error("304", "GetObject", 304)
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+class LocalTable:
+    """DynamoDB table stand-in for the webhooks table, keyed by webhook_url.
+
+    Supports the update expressions api.py uses: SET (with if_not_exists), ADD and REMOVE, and
+    conditions joined by AND/OR over attribute_exists, attribute_not_exists, = and <>. Every
+    write holds the table lock, so concurrent writes to one item serialize as they would on a
+    partition.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.items = {}
+        self.counters = Counters()
+        self._lock = threading.Lock()
+
+    def get_item(self, Key, ConsistentRead=False):
+        self.latency.wait()
+        self.counters.add("get_item")
+        with self._lock:
+            item = self.items.get(Key['webhook_url'])
+            return {"Item": dict(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None):
+        self.latency.wait()
+        self.counters.add("update_item")
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        with self._lock:
+            item = self.items.get(Key['webhook_url'])
+            if ConditionExpression and not self._condition(ConditionExpression, item or {}, names, values):
+                self.counters.add("conditional_check_failed")
+                raise client_error("ConditionalCheckFailedException", "UpdateItem")
+            item = dict(item or Key)
+            updated = self._apply(UpdateExpression, item, names, values)
+            self.items[Key['webhook_url']] = item
+        if ReturnValues == "UPDATED_NEW":
+            return {"Attributes": {name: item[name] for name in updated if name in item}}
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": dict(item)}
+        return {}
+
+    def _condition(self, expression, item, names, values):
+        return any(
+            all(self._term(term.strip(), item, names, values) for term in clause.split(" AND "))
+            for clause in expression.split(" OR ")
+        )
+
+    def _term(self, term, item, names, values):
+        function = re.fullmatch(r"(attribute_exists|attribute_not_exists)\((\S+)\)", term)
+        if function:
+            exists = names.get(function.group(2), function.group(2)) in item
+            return exists if function.group(1) == "attribute_exists" else not exists
+        name, operator, value = term.split()
+        current = item.get(names.get(name, name))
+        return current == values[value] if operator == "=" else current != values[value]
+
+    def _apply(self, expression, item, names, values):
+        updated = []
+        sections = re.split(r"\b(SET|ADD|REMOVE)\b", expression)
+        for action, body in zip(sections[1::2], sections[2::2]):
+            # Commas inside if_not_exists(...) do not separate clauses
+            for clause in re.split(r",\s*(?![^()]*\))", body.strip()):
+                if action == "REMOVE":
+                    item.pop(names.get(clause, clause), None)
+                    continue
+                if action == "ADD":
+                    name, value = clause.split()
+                    name = names.get(name, name)
+                    item[name] = item.get(name, 0) + values[value]
+                else:
+                    name, value = (part.strip() for part in clause.split("=", 1))
+                    name = names.get(name, name)
+                    default = re.fullmatch(r"if_not_exists\((\S+),\s*(\S+)\)", value)
+                    item[name] = item.get(name, values[default.group(2)]) if default else values[value]
+                updated.append(name)
+        return updated
+
+class SchedulerExceptions:
+    class ConflictException(Exception):
+        pass
+
+    class ResourceNotFoundException(Exception):
+        pass
+
+class LocalScheduler:
+    exceptions = SchedulerExceptions
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.schedules = {}
+        self.counters = Counters()
+        self._lock = threading.Lock()
+
+    def create_schedule(self, **schedule):
+        self.latency.wait()
+        with self._lock:
+            if schedule['Name'] in self.schedules:
+                self.counters.add("create_conflict")
+                raise SchedulerExceptions.ConflictException(schedule['Name'])
+            self.schedules[schedule['Name']] = schedule
+        self.counters.add("create_schedule")
+
+    def update_schedule(self, **schedule):
+        self.latency.wait()
+        with self._lock:
+            if schedule['Name'] not in self.schedules:
+                raise SchedulerExceptions.ResourceNotFoundException(schedule['Name'])
+            self.schedules[schedule['Name']] = schedule
+        self.counters.add("update_schedule")
+
+    def get_schedule(self, Name, GroupName):
+        self.latency.wait()
+        with self._lock:
+            if Name not in self.schedules:
+                raise SchedulerExceptions.ResourceNotFoundException(Name)
+            return self.schedules[Name]
+
+    def delete_schedule(self, Name, GroupName):
+        self.latency.wait()
+        with self._lock:
+            if self.schedules.pop(Name, None) is None:
+                self.counters.add("delete_not_found")
+                raise SchedulerExceptions.ResourceNotFoundException(Name)
+        self.counters.add("delete_schedule")
+
+class LocalLambda:
+    """Runs asynchronous invocations of the notifier with api.lambda_handler on a thread pool."""
+
+    def __init__(self, recorder, max_workers):
+        self.recorder = recorder
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="notifier")
+        self.counters = Counters()
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        event = json.loads(Payload)
+        self.counters.add("invoke")
+        self.executor.submit(self.recorder.call, f"notifier {event.get('mode')}", api.lambda_handler, event)
+        return {"StatusCode": 202}
+
+class DiscordState:
+    def __init__(self, limit, window, latency, global_429_rate):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.global_429_rate = global_429_rate
+        self.buckets = {} # path -> [remaining, reset_at]
+        self.counters = Counters()
+        self.lock = threading.Lock()
+
+class DiscordHandler(http.server.BaseHTTPRequestHandler):
+    """A Discord webhook endpoint that answers 204, or 429 once a webhook's bucket is empty."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        state.latency.wait()
+        now = time.monotonic()
+        if random.random() < state.global_429_rate:
+            state.counters.add("global_429")
+            return self.respond(429, {"retry_after": 1.0, "global": True}, {"X-RateLimit-Global": "true", "Retry-After": "1"})
+        with state.lock:
+            bucket = state.buckets.get(self.path)
+            if bucket is None or bucket[1] <= now:
+                bucket = state.buckets[self.path] = [state.limit, now + state.window]
+            reset_after = bucket[1] - now
+            if bucket[0] <= 0:
+                state.counters.add("429")
+                return self.respond(429, {"retry_after": reset_after, "global": False},
+                                    {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": f"{reset_after:.3f}"})
+            bucket[0] -= 1
+            remaining = bucket[0]
+        state.counters.add("delivered")
+        self.respond(204, None, {"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset-After": f"{reset_after:.3f}"})
+
+    def respond(self, status, body, headers):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Bucket", "webhook")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+class DiscordServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+def start_discord(state):
+    server = DiscordServer(("127.0.0.1", 0), DiscordHandler)
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class Recorder:
+    """Collects the latency and outcome of every handler call, per route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {} # route -> {"latencies": [...], "outcomes": {outcome: count}}
+
+    def call(self, route, handler, event):
+        started = time.perf_counter()
+        try:
+            outcome = str(handler(event, None).get('statusCode'))
+        except Exception as e:
+            outcome = type(e).__name__
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self.routes.setdefault(route, {"latencies": [], "outcomes": {}})
+            stats["latencies"].append(elapsed_ms)
+            stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+
+    def report(self, elapsed):
+        report = {}
+        for route, stats in sorted(self.routes.items()):
+            latencies = sorted(stats["latencies"])
+            errors = sum(count for outcome, count in stats["outcomes"].items() if not outcome.startswith("2"))
+            report[route] = {
+                "requests": len(latencies),
+                "throughput_per_s": round(len(latencies) / elapsed, 1),
+                "error_rate": round(errors / len(latencies), 4),
+                "outcomes": stats["outcomes"],
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p90_ms": round(percentile(latencies, 0.90), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "max_ms": round(latencies[-1], 2)
+            }
+        return report
+
+def shifted_snapshot(now):
+    """The bundled schedules.json as a snapshot moved forward to start now, on the same rotation slots."""
+    with open(os.path.join(REPO_ROOT, "schedules.json")) as f:
+        snapshot = data_fetcher.build_schedule_snapshot(json.load(f))
+    earliest = min(node[0] for node in snapshot['nodes'])
+    offset = max(0, -(-(now - earliest) // ROTATION_SECONDS) * ROTATION_SECONDS)
+    snapshot['nodes'] = [[start + offset, end + offset, *rest] for start, end, *rest in snapshot['nodes']]
+    return snapshot
+
+def run_client(recorder, deadline, webhook_urls, rule_sets, check_ratio, seed):
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        webhook_url = rng.choice(webhook_urls)
+        if rng.random() < check_ratio:
+            recorder.call("GET /check-webhook", api.handler, {
+                "httpMethod": "GET",
+                "path": "/check-webhook",
+                "queryStringParameters": {"webhookUrl": webhook_url}
+            })
+        else:
+            recorder.call("POST /submit-webhook", api.handler, {
+                "httpMethod": "POST",
+                "path": "/submit-webhook",
+                "body": json.dumps({"webhookUrl": webhook_url, "rules": rng.choice(rule_sets)})
+            })
+
+def print_report(report, elapsed, counters):
+    print(f"\n{'route':<24}{'requests':>10}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  outcomes")
+    for route, stats in report.items():
+        print(f"{route:<24}{stats['requests']:>10}{stats['throughput_per_s']:>9}{stats['error_rate']:>9.2%}"
+              f"{stats['p50_ms']:>10}{stats['p90_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}  {stats['outcomes']}")
+    print(f"\nDuration: {elapsed:.1f}s")
+    for name, values in counters.items():
+        print(f"{name}: {json.dumps(values, sort_keys=True)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent API clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to generate load for")
+    parser.add_argument("--webhooks", type=int, default=200, help="Distinct webhooks; fewer means more contention per item")
+    parser.add_argument("--rule-sets", type=int, default=50, help="Distinct rule sets submitted")
+    parser.add_argument("--check-ratio", type=float, default=0.7, help="Fraction of requests that are /check-webhook")
+    parser.add_argument("--schedules", choices=["per-webhook", "batch"], default="batch",
+                        help="per-webhook creates an EventBridge schedule per submit; batch deletes it as production does")
+    parser.add_argument("--aws-latency-ms", type=float, default=8)
+    parser.add_argument("--discord-latency-ms", type=float, default=40)
+    parser.add_argument("--discord-limit", type=int, default=5, help="Messages per webhook per rate limit window")
+    parser.add_argument("--discord-window", type=float, default=2.0, help="Seconds per rate limit window")
+    parser.add_argument("--discord-global-429-rate", type=float, default=0.0, help="Fraction of Discord requests answered with a global 429")
+    parser.add_argument("--notifier-workers", type=int, default=16, help="Concurrent asynchronous notifier invocations")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--show-logs", action="store_true", help="Keep the handlers' logs and EMF lines on stdout")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    recorder = Recorder()
+    aws_latency = Latency(args.aws_latency_ms)
+    snapshot = shifted_snapshot(int(time.time()))
+    s3 = LocalS3({api.SNAPSHOT_FILE_KEY: json.dumps(snapshot).encode('utf-8')}, aws_latency)
+    table = LocalTable(aws_latency)
+    scheduler = LocalScheduler(aws_latency)
+    notifier = LocalLambda(recorder, args.notifier_workers)
+    discord_state = DiscordState(args.discord_limit, args.discord_window, Latency(args.discord_latency_ms), args.discord_global_429_rate)
+    discord, discord_url = start_discord(discord_state)
+
+    # The stand-ins take the place of the clients api.py would otherwise create on first use
+    api._LAZY_RESOURCES.update({
+        "s3_client": s3,
+        "webhooks_table": table,
+        "scheduler_client": scheduler,
+        "lambda_client": notifier
+    })
+    api.DESTINATION_LAMBDA_ARN = "arn:aws:lambda:local:000000000000:function:splat-notifyer-update"
+    api.PER_WEBHOOK_SCHEDULES = args.schedules == "per-webhook"
+    api.NOTIFY_MODE = "incremental"
+
+    webhook_urls = [f"{discord_url}/api/webhooks/{index}/token-{index}" for index in range(args.webhooks)]
+    rule_sets = [body["rules"] for body in make_population(args.rule_sets, 5, args.seed)]
+
+    output = contextlib.nullcontext() if args.show_logs else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with output:
+        started = time.monotonic()
+        deadline = started + args.duration
+        with ThreadPoolExecutor(max_workers=args.clients) as clients:
+            for client in range(args.clients):
+                clients.submit(run_client, recorder, deadline, webhook_urls, rule_sets, args.check_ratio, args.seed + client)
+        elapsed = time.monotonic() - started
+        # Notifier invocations queued near the end still count towards their route
+        notifier.executor.shutdown(wait=True)
+    discord.shutdown()
+
+    report = recorder.report(elapsed)
+    counters = {
+        "dynamodb": table.counters.values,
+        "scheduler": scheduler.counters.values,
+        "lambda": notifier.counters.values,
+        "s3": s3.counters.values,
+        "discord": discord_state.counters.values
+    }
+    print_report(report, elapsed, counters)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "duration_s": elapsed, "routes": report, "stand_ins": counters}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
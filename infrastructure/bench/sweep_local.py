@@ -0,0 +1,123 @@
+"""Runs a sharded batch sweep locally with a process pool.
+
+Workers claim shards from a SQLite lease table shared through a temporary file, exactly as
+notifier Lambdas claim them from DynamoDB, and sweep each shard with api.process_sweep_shard.
+The synthetic subscriber population sits in an in-memory table whose parallel scan splits the
+hash space of the webhook URLs into contiguous segments, as DynamoDB does with its partition
+keys. Outboxes are per-process in-memory SQLite queues and nothing is delivered, so no AWS or
+Discord calls are made.
+
+    python infrastructure/bench/sweep_local.py --subscribers 20000 --shards 16 --workers 4 --fail-shard 3
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+# Keeps api from touching DynamoDB for watermarks and quiets the per-shard logs; the AWS environment
+# setup lives in the benchmark module
+os.environ["NOTIFY_MODE"] = "full"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+from bench_notifications import REPO_ROOT, api, make_population # noqa: E402
+from sweep_shards import ShardCoordinator, SQLiteLeaseBackend # noqa: E402
+
+SWEEP_ID = "local-sweep"
+
+# Set before the pool forks, so every worker process shares it
+FAIL_SHARDS = set()
+
+class SegmentedTable:
+    """Read-only webhooks table whose scan honors Segment and TotalSegments.
+
+    Items are ordered by an MD5 hash of their partition key and segment i of n covers the i-th
+    of n equal ranges of the hash space, the way DynamoDB splits a parallel scan.
+    """
+
+    HASH_SPACE = 1 << 128
+
+    def __init__(self, items, page_size=1000):
+        self.items = sorted(((self.key_hash(item['webhook_url']), item) for item in items), key=lambda pair: pair[0])
+        self.page_size = page_size
+
+    @staticmethod
+    def key_hash(webhook_url):
+        return int(hashlib.md5(webhook_url.encode('utf-8')).hexdigest(), 16)
+
+    def scan(self, Segment=0, TotalSegments=1, ExclusiveStartKey=None):
+        low = self.HASH_SPACE * Segment // TotalSegments
+        high = self.HASH_SPACE * (Segment + 1) // TotalSegments
+        if ExclusiveStartKey:
+            low = self.key_hash(ExclusiveStartKey['webhook_url']) + 1
+        page = []
+        for key_hash, item in self.items:
+            if low <= key_hash < high:
+                page.append(item)
+                if len(page) == self.page_size:
+                    return {"Items": page, "LastEvaluatedKey": {"webhook_url": item['webhook_url']}}
+        return {"Items": page}
+
+def process_shard(shard, shard_count, timestamp):
+    if shard in FAIL_SHARDS:
+        # Fails only the first attempt, so the shard is released and reclaimed
+        FAIL_SHARDS.discard(shard)
+        raise RuntimeError(f"Simulated failure of shard {shard}")
+    return api.process_sweep_shard(shard, shard_count, timestamp)
+
+def run_worker(lease_path, worker_id):
+    coordinator = ShardCoordinator(SQLiteLeaseBackend(lease_path))
+    started = time.perf_counter()
+    shards = coordinator.run_worker(SWEEP_ID, f"local-worker-{worker_id}", process_shard)
+    return worker_id, shards, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=20000)
+    parser.add_argument("--max-rules", type=int, default=5, help="Upper bound of rules per subscriber")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--fail-shard", type=int, action="append", default=[], help="Fail this shard's first attempt to exercise reclaiming")
+    args = parser.parse_args()
+
+    with open(os.path.join(REPO_ROOT, "schedules.json")) as f:
+        nodes = api.generalize_schedule_data(json.load(f))
+    api.SCHEDULE_CACHE.nodes = nodes
+    api.SCHEDULE_CACHE.checked_at = float("inf") # Never revalidate against S3
+    timestamp = api.datetime.fromtimestamp(nodes[-1].start - 1, api.timezone.utc).isoformat()
+
+    # Read by process_sweep_shard through iter_subscriptions, exactly like the webhooks table
+    api._LAZY_RESOURCES["webhooks_table"] = SegmentedTable(
+        {"webhook_url": body["webhookUrl"], "config": {"rules": body["rules"]}}
+        for body in make_population(args.subscribers, args.max_rules, args.seed)
+    )
+    FAIL_SHARDS.update(args.fail_shard)
+
+    with tempfile.TemporaryDirectory() as directory:
+        lease_path = os.path.join(directory, "leases.sqlite3")
+        coordinator = ShardCoordinator(SQLiteLeaseBackend(lease_path))
+        coordinator.start(SWEEP_ID, args.shards, timestamp)
+
+        started = time.perf_counter()
+        context = multiprocessing.get_context("fork")
+        with context.Pool(args.workers) as pool:
+            results = pool.starmap(run_worker, [(lease_path, worker_id) for worker_id in range(args.workers)])
+        elapsed = time.perf_counter() - started
+
+        # Shards released by a failed attempt after every worker had finished are picked up here
+        leftovers = run_worker(lease_path, "final")
+        progress = coordinator.progress(SWEEP_ID)
+
+    for worker_id, shards, seconds in results + [leftovers]:
+        print(f"worker {worker_id}: shards {shards} in {seconds:.2f}s")
+    print(f"\n{args.subscribers} subscribers in {args.shards} shards on {args.workers} workers: {elapsed:.2f}s")
+    print(json.dumps(progress, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 data "archive_file" "data_fetcher_lambda_archive" {
   type        = "zip"
-  source_file = "./files/data_fetcher.py"
   output_path = "./.build/data_fetcher.zip"
+
+  dynamic "source" {
+    for_each = ["data_fetcher.py", "instrumentation.py", "schedule_history.py"]
+    content {
+      content  = file("./files/${source.value}")
+      filename = source.value
+    }
+  }
 }
 
 resource "aws_s3_bucket" "splat_notifyer_data_cache" {
@@ -1,309 +1,1128 @@
+import time
+# Measured from the first import so the cold-start report covers importing boto3 as well
+STARTUP_STARTED = time.perf_counter()
+
+import base64
 import json
 import os
-import urllib.request
 import boto3
+from botocore.exceptions import ClientError
 from datetime import datetime, timezone, timedelta
-import re
 import hashlib
-import time # Added for retry delay
+import threading
+import bisect
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from discord_delivery import DiscordDeliveryEngine, is_rate_limited
+from instrumentation import INSTRUMENTATION
+from message_packer import pack_sections
+from outbox import DynamoDBOutboxBackend, Outbox, SQLiteOutboxBackend
+from rules_schema import MATCH_TYPES, TIME_SLOTS, RulesSchema, canonicalize_rules
+from schedule_history import LocalHistoryStore, S3HistoryStore, ScheduleHistory
+from subscription_store import SubscriptionStore
+from sweep_shards import DynamoDBLeaseBackend, ShardCoordinator, SQLiteLeaseBackend
+
+# Milliseconds spent on each initialization phase of this container, reported once on the first invocation
+STARTUP_TIMINGS = {"imports": round((time.perf_counter() - STARTUP_STARTED) * 1000, 2)}
 
-# S3 related imports and environment variables from notifyer_update.py
-s3 = boto3.client("s3")
+# S3 related environment variables from notifyer_update.py
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME", "splat-notifyer-data")
 DATA_FILE_KEY = os.environ.get("DATA_FILE_KEY", "data.json")
+SNAPSHOT_FILE_KEY = os.environ.get("SNAPSHOT_FILE_KEY", "snapshot.json")
+SNAPSHOT_FORMAT_VERSION = 1 # Must match data_fetcher.SNAPSHOT_FORMAT_VERSION
+# How long a warm container trusts its schedule before revalidating the S3 ETag
+SCHEDULE_CACHE_TTL_SECONDS = int(os.environ.get("SCHEDULE_CACHE_TTL_SECONDS", "60"))
 
 DYNAMODB_TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "splat-notifyer-webhooks")
 EVENTBRIDGE_ROLE_ARN = os.environ.get("EVENTBRIDGE_ROLE_ARN") # ARN for the role that EventBridge will assume
 EVENTBRIDGE_SCHEDULE_GROUP_NAME = os.environ.get("EVENTBRIDGE_SCHEDULE_GROUP_NAME", "splat-notifyer-schedules")
 DESTINATION_LAMBDA_ARN = os.environ.get("DESTINATION_LAMBDA_ARN") # ARN of the Lambda function that the schedule will invoke
+# When disabled, subscribers are only notified by the batch sweep instead of their own EventBridge schedule
+PER_WEBHOOK_SCHEDULES = os.environ.get("PER_WEBHOOK_SCHEDULES", "true").lower() == "true"
+NOTIFY_MAX_WORKERS = int(os.environ.get("NOTIFY_MAX_WORKERS", "16"))
+OUTBOX_TABLE_NAME = os.environ.get("OUTBOX_TABLE_NAME", "splat-notifyer-outbox")
+# Set to use a local SQLite outbox instead of DynamoDB, e.g. for tests
+OUTBOX_SQLITE_PATH = os.environ.get("OUTBOX_SQLITE_PATH")
+OUTBOX_DRAIN_MARGIN_SECONDS = 5
+NOTIFY_LOOKAHEAD_HOURS = 20
+# Shards of a coordinated sweep; each is claimed through a lease by one worker invocation
+SWEEP_SHARDS = int(os.environ.get("SWEEP_SHARDS", "8"))
+SWEEP_LEASE_TABLE_NAME = os.environ.get("SWEEP_LEASE_TABLE_NAME", "splat-notifyer-sweep-leases")
+# Set to use a local SQLite lease table instead of DynamoDB, e.g. for tests
+SWEEP_LEASE_SQLITE_PATH = os.environ.get("SWEEP_LEASE_SQLITE_PATH")
+# A shard whose worker has not reported back after this long is handed to another worker; just
+# over the notifier's 300 second timeout, so a crashed worker's shards are claimable by the next run
+SWEEP_LEASE_SECONDS = int(os.environ.get("SWEEP_LEASE_SECONDS", "330"))
+SWEEP_INTERVAL_HOURS = 2
+# Set to replay against a local copy of the schedule history instead of the S3 archive
+SCHEDULE_HISTORY_DIR = os.environ.get("SCHEDULE_HISTORY_DIR")
+# "incremental" only evaluates nodes newer than each rule's stored watermark; "full" re-evaluates every upcoming node
+NOTIFY_MODE = os.environ.get("NOTIFY_MODE", "full")
+# Embeds fit more per request, but mentions inside them do not ping
+NOTIFY_USE_EMBEDS = os.environ.get("NOTIFY_USE_EMBEDS", "false").lower() == "true"
+# How long a warm container answers /check-webhook for a webhook from memory instead of DynamoDB
+CONFIG_CACHE_TTL_SECONDS = int(os.environ.get("CONFIG_CACHE_TTL_SECONDS", "30"))
+# A webhook that accepted a message within this window is not sent another validation message
+WEBHOOK_VALIDATION_TTL_SECONDS = int(os.environ.get("WEBHOOK_VALIDATION_TTL_SECONDS", str(24 * 3600)))
+# Longest a submission waits on a Discord rate limit before leaving delivery to the initial stage
+SUBMIT_VALIDATION_MAX_WAIT_SECONDS = float(os.environ.get("SUBMIT_VALIDATION_MAX_WAIT_SECONDS", "1"))
+# Request bodies larger than this are rejected before they are parsed
+MAX_BODY_BYTES = 64 * 1024
 
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(DYNAMODB_TABLE_NAME)
-scheduler_client = boto3.client("scheduler")
+DELIVERY_ENGINE = DiscordDeliveryEngine(max_workers=NOTIFY_MAX_WORKERS)
+# Compiled once per container from the stage and mode catalogs
+RULES_SCHEMA = RulesSchema.from_catalogs()
 
-def send_discord_message(webhook_url, message_content, retries=5, initial_delay=1):
-    payload = {
-        "content": message_content
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": "python-requests/2.32.3"
-    }
+# AWS clients and the outbox are created on first use, so each route only pays for what it touches
+_LAZY_RESOURCES = {}
+_LAZY_RESOURCES_LOCK = threading.RLock()
 
-    for i in range(retries):
-        req = urllib.request.Request(webhook_url, data=json.dumps(payload).encode('utf-8'), headers=headers, method='POST')
-        try:
-            with urllib.request.urlopen(req) as response:
-                status_code = response.getcode()
-                if 200 <= status_code < 300:
-                    print(f"Successfully sent Discord message after {i+1} attempts.")
-                    return True
-                else:
-                    print(f"Discord API returned status {status_code} on attempt {i+1}.")
-        except urllib.error.HTTPError as e:
-            if e.code == 429:
-                retry_after = int(e.headers.get("Retry-After", initial_delay * (2 ** i)))
-                print(f"Rate limited by Discord (429) on attempt {i+1}. Retrying after {retry_after} seconds.")
-                time.sleep(retry_after)
-            else:
-                print(f"HTTP Error sending message to Discord on attempt {i+1}: {e.code} - {e.reason}")
-                return False
-        except urllib.error.URLError as e:
-            print(f"URL Error sending message to Discord on attempt {i+1}: {e.reason}")
-            return False
-        except Exception as e:
-            print(f"An unexpected error occurred sending message to Discord on attempt {i+1}: {e}")
-            return False
-            
-    print(f"Failed to send Discord message after {retries} attempts.")
-    return False
+def lazy_init(phase, factory):
+    """Returns the container-wide resource for phase, creating it on first use and timing that."""
+    resource = _LAZY_RESOURCES.get(phase)
+    if resource is None:
+        with _LAZY_RESOURCES_LOCK:
+            resource = _LAZY_RESOURCES.get(phase)
+            if resource is None:
+                started = time.perf_counter()
+                resource = factory()
+                STARTUP_TIMINGS[phase] = round((time.perf_counter() - started) * 1000, 2)
+                _LAZY_RESOURCES[phase] = resource
+    return resource
+
+def get_s3_client():
+    return lazy_init("s3_client", lambda: INSTRUMENTATION.instrument_client(boto3.client("s3"), "s3"))
+
+def get_dynamodb():
+    def create_dynamodb():
+        dynamodb = boto3.resource("dynamodb")
+        INSTRUMENTATION.instrument_client(dynamodb.meta.client, "dynamodb")
+        return dynamodb
+    return lazy_init("dynamodb_resource", create_dynamodb)
+
+def get_table():
+    return lazy_init("webhooks_table", lambda: get_dynamodb().Table(DYNAMODB_TABLE_NAME))
+
+def get_scheduler_client():
+    return lazy_init("scheduler_client", lambda: INSTRUMENTATION.instrument_client(boto3.client("scheduler"), "scheduler"))
+
+def get_lambda_client():
+    return lazy_init("lambda_client", lambda: INSTRUMENTATION.instrument_client(boto3.client("lambda"), "lambda"))
+
+def get_submit_executor():
+    # Runs the independent steps of a submission side by side
+    return lazy_init("submit_executor", lambda: ThreadPoolExecutor(max_workers=4, thread_name_prefix="submit"))
+
+def get_shard_coordinator():
+    def create_coordinator():
+        if SWEEP_LEASE_SQLITE_PATH:
+            return ShardCoordinator(SQLiteLeaseBackend(SWEEP_LEASE_SQLITE_PATH), lease_seconds=SWEEP_LEASE_SECONDS)
+        return ShardCoordinator(DynamoDBLeaseBackend(get_dynamodb().Table(SWEEP_LEASE_TABLE_NAME)), lease_seconds=SWEEP_LEASE_SECONDS)
+    return lazy_init("shard_coordinator", create_coordinator)
+
+def get_schedule_history():
+    def create_history():
+        if SCHEDULE_HISTORY_DIR:
+            return ScheduleHistory(LocalHistoryStore(SCHEDULE_HISTORY_DIR))
+        return ScheduleHistory(S3HistoryStore(get_s3_client(), S3_BUCKET_NAME))
+    return lazy_init("schedule_history", create_history)
+
+def get_outbox():
+    def create_outbox():
+        if OUTBOX_SQLITE_PATH:
+            return Outbox(SQLiteOutboxBackend(OUTBOX_SQLITE_PATH))
+        return Outbox(DynamoDBOutboxBackend(get_dynamodb().Table(OUTBOX_TABLE_NAME)))
+    return lazy_init("outbox", create_outbox)
+
+def webhook_log_id(webhook_url):
+    """Short stable id for logs; the webhook URL itself contains its token."""
+    return hashlib.sha256(webhook_url.encode('utf-8')).hexdigest()[:12]
+
+def send_discord_message(webhook_url, message_content):
+    return DELIVERY_ENGINE.send(webhook_url, {"content": message_content}).ok
 
 def validate_rules_payload(payload):
-    # Top-level validation
-    if not isinstance(payload, dict):
-        return False, "Payload must be a dictionary."
-    
-    webhook_url = payload.get("webhookUrl")
-    rules = payload.get("rules")
+    """Returns (is_valid, message, canonical rules) for a /submit-webhook body."""
+    return RULES_SCHEMA.validate(payload)
 
-    if not isinstance(webhook_url, str) or not webhook_url:
-        return False, "webhookUrl is required and must be a non-empty string."
+def rules_fingerprint(canonical_rules):
+    """Subscribers whose canonical rules share a fingerprint receive identical notifications."""
+    return hashlib.sha256(json.dumps(canonical_rules, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
 
-    if not isinstance(rules, list):
-        return False, "rules is required and must be a list."
+# A generalized bankara/X rotation. start/end are epoch seconds and slot is the "HH:MMZ" start time slot.
+ScheduleNode = namedtuple("ScheduleNode", ["start", "end", "match_type", "rule_id", "rule_name", "stage_ids", "stage_names", "slot"])
 
-    TIME_SLOT_REGEX = re.compile(r"^\d{2}:\d{2}Z$")
-    
-    for i, rule in enumerate(rules):
-        if not isinstance(rule, dict):
-            return False, f"Rule at index {i} must be a dictionary."
-
-        notification_message = rule.get("notificationMessage")
-        if not isinstance(notification_message, str) or not notification_message.strip():
-            return False, f"notificationMessage in rule {i} is required and must be a non-empty string."
-        if len(notification_message) > 300:
-            return False, f"notificationMessage in rule {i} cannot exceed 300 characters."
-
-        match_type = rule.get("matchType")
-        if match_type not in ["X-Battle", "Series", "Open"]:
-            return False, f"matchType in rule {i} must be 'X-Battle' or 'Open' or 'Series'."
-
-        time_slots = rule.get("timeSlots")
-        if not isinstance(time_slots, list):
-            return False, f"timeSlots in rule {i} is required and must be a list."
-        for j, slot in enumerate(time_slots):
-            if not isinstance(slot, str) or not TIME_SLOT_REGEX.match(slot):
-                return False, f"timeSlots[{j}] in rule {i} is invalid. Expected format HH:MM-HH:MM UTC."
-
-        battle_modes = rule.get("battleModes")
-        if not isinstance(battle_modes, dict):
-            return False, f"battleModes in rule {i} is required and must be a dictionary."
-        for mode_name, is_enabled in battle_modes.items():
-            if not isinstance(mode_name, str) or not mode_name:
-                return False, f"battleModes key in rule {i} must be a non-empty string."
-            if not isinstance(is_enabled, bool):
-                return False, f"battleModes value for '{mode_name}' in rule {i} must be a boolean."
-
-        maps = rule.get("maps")
-        if not isinstance(maps, dict):
-            return False, f"maps in rule {i} is required and must be a dictionary."
-        for mode_name, map_details in maps.items():
-            if not isinstance(mode_name, str) or not mode_name:
-                return False, f"maps key in rule {i} must be a non-empty string."
-            if not isinstance(map_details, dict):
-                return False, f"map details for '{mode_name}' in rule {i} must be a dictionary."
-            
-            notify_type = map_details.get("notifyType")
-            if notify_type not in ["at-least-one", "two-same-rotation"]:
-                return False, f"notifyType for map '{mode_name}' in rule {i} must be 'at-least-one' or 'two-same-rotation'."
-
-            selected_maps = map_details.get("selectedMaps")
-            if not isinstance(selected_maps, list):
-                return False, f"selectedMaps for map '{mode_name}' in rule {i} is required and must be a list."
-            if not all(isinstance(m, str) and m for m in selected_maps):
-                return False, f"All selectedMaps for map '{mode_name}' in rule {i} must be non-empty strings."
-
-    return True, "Payload is valid."
-
-# Load data.json during the Lambda initialization phase
-DATA = {}
-GENERALIZED_SCHEDULE_NODES = []
-try:
-    response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=DATA_FILE_KEY)
-    DATA = json.loads(response['Body'].read().decode('utf-8'))
-    print(f"data.json loaded during init.")
+def parse_epoch(timestamp):
+    dt_obj = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if dt_obj.tzinfo is None:
+        dt_obj = dt_obj.replace(tzinfo=timezone.utc)
+    return int(dt_obj.timestamp())
+
+def make_schedule_node(start, end, match_type, rule_id, rule_name, stage_ids, stage_names):
+    slot = datetime.fromtimestamp(start, timezone.utc).strftime("%H:%M") + "Z"
+    return ScheduleNode(start, end, match_type, rule_id, rule_name, tuple(stage_ids), tuple(stage_names), slot)
 
+def generalize_schedule_data(data):
+    """Builds the generalized bankara/X nodes from the raw splatoon3.ink document, sorted by start descending."""
     all_nodes = []
 
+    def add_node(schedule_node, match_type, setting):
+        try:
+            start = parse_epoch(schedule_node['startTime'])
+            end = parse_epoch(schedule_node['endTime'])
+        except ValueError:
+            # Nodes with an invalid datetime format could never match, so they are dropped
+            return
+        stages = setting.get('vsStages', [])
+        all_nodes.append(make_schedule_node(
+            start,
+            end,
+            match_type,
+            setting['vsRule']['id'],
+            setting['vsRule']['name'],
+            [stage['id'] for stage in stages],
+            [stage['name'] for stage in stages]
+        ))
+
     # Process bankaraSchedules
-    for schedule_node in DATA.get('data', {}).get('bankaraSchedules', {}).get('nodes', []):
-        start_time = schedule_node['startTime']
-        end_time = schedule_node['endTime']
-        for setting in schedule_node.get('bankaraMatchSettings', []):
+    for schedule_node in data.get('data', {}).get('bankaraSchedules', {}).get('nodes', []):
+        for setting in schedule_node.get('bankaraMatchSettings') or []:
             match_type = ""
             if setting.get('bankaraMode') == "CHALLENGE":
                 match_type = "Series"
             elif setting.get('bankaraMode') == "OPEN":
                 match_type = "Open"
-            
-            all_nodes.append({
-                "startTime": start_time,
-                "endTime": end_time,
-                "matchType": match_type,
-                "matchSettings": setting
-            })
+            add_node(schedule_node, match_type, setting)
     
     # Process xSchedules
-    for schedule_node in DATA.get('data', {}).get('xSchedules', {}).get('nodes', []):
-        start_time = schedule_node['startTime']
-        end_time = schedule_node['endTime']
-        setting = schedule_node.get('xMatchSetting', {})
-        
-        all_nodes.append({
-            "startTime": start_time,
-            "endTime": end_time,
-            "matchType": "X-Battle",
-            "matchSettings": setting
-        })
-
-    # Sort nodes by startTime descending
-    def get_sort_key(node):
+    for schedule_node in data.get('data', {}).get('xSchedules', {}).get('nodes', []):
+        setting = schedule_node.get('xMatchSetting')
+        if setting:
+            add_node(schedule_node, "X-Battle", setting)
+
+    return sorted(all_nodes, key=lambda node: node.start, reverse=True)
+
+def generalize_schedule_snapshot(snapshot):
+    """Builds the generalized nodes from the fetcher's pre-normalized snapshot, which is already sorted."""
+    if snapshot.get('version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {snapshot.get('version')}")
+
+    rule_names = snapshot['rules']
+    stage_names = snapshot['stages']
+    return [
+        make_schedule_node(
+            start,
+            end,
+            match_type,
+            vs_rule_id,
+            rule_names[vs_rule_id],
+            stage_ids,
+            [stage_names[stage_id] for stage_id in stage_ids]
+        )
+        for start, end, match_type, vs_rule_id, stage_ids in snapshot['nodes']
+    ]
+
+def upcoming_nodes(nodes, current_epoch):
+    """Returns the nodes starting strictly after current_epoch, using a binary search over the descending order."""
+    cutoff = bisect.bisect_left(nodes, -current_epoch, key=lambda node: -node.start)
+    return nodes[:cutoff]
+
+def is_not_modified(error):
+    return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304 \
+        or error.response.get('Error', {}).get('Code') in ('304', 'NotModified')
+
+class ScheduleCache:
+    """Holds the generalized schedule nodes for the lifetime of a warm container.
+
+    Once the TTL has passed, the S3 object is revalidated with a conditional get_object on its
+    ETag and only re-parsed when it changed. The fetcher's snapshot is preferred; the raw
+    data.json is used when the snapshot is missing or has an unknown version.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.nodes = []
+        self.source_key = None
+        self.etag = None
+        self.checked_at = None
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "not_modified": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def get_nodes(self):
+        if self._is_fresh():
+            self.stats["hits"] += 1
+            return self.nodes
+
+        with self._lock:
+            # Another thread may have revalidated while we waited for the lock
+            if self._is_fresh():
+                self.stats["hits"] += 1
+                return self.nodes
+            self.stats["misses"] += 1
+            started = time.perf_counter()
+            try:
+                self._revalidate()
+                if self.checked_at is None:
+                    STARTUP_TIMINGS["schedule_load"] = round((time.perf_counter() - started) * 1000, 2)
+                self.checked_at = time.monotonic()
+            except Exception as e:
+                # Keep serving the last good nodes; the next call retries the load
+                self.stats["errors"] += 1
+                INSTRUMENTATION.error("Error loading or processing schedule data from S3", error=str(e))
+        return self.nodes
+
+    def _is_fresh(self):
+        return self.checked_at is not None and time.monotonic() - self.checked_at < self.ttl_seconds
+
+    def _revalidate(self):
         try:
-            dt_obj = datetime.fromisoformat(node['startTime'].replace('Z', '+00:00'))
-            if dt_obj.tzinfo is None:
-                dt_obj = dt_obj.replace(tzinfo=timezone.utc)
-            return dt_obj
-        except ValueError:
-            # Handle invalid datetime format by returning a very old date.
-            # This ensures they are at the end of the descending sorted list and effectively ignored.
-            return datetime.min.replace(tzinfo=timezone.utc)
-    
-    GENERALIZED_SCHEDULE_NODES = sorted(all_nodes, key=get_sort_key, reverse=True)
-    print(f"Generalized schedule nodes processed and sorted during init. Total nodes: {len(GENERALIZED_SCHEDULE_NODES)}")
+            if self._load(SNAPSHOT_FILE_KEY, json.loads, generalize_schedule_snapshot):
+                return
+        except Exception as e:
+            INSTRUMENTATION.warning(f"Could not use {SNAPSHOT_FILE_KEY}, falling back to {DATA_FILE_KEY}", error=str(e))
+        self._load(DATA_FILE_KEY, lambda body: json.loads(body.decode('utf-8')), generalize_schedule_data)
+
+    def _load(self, key, parse, generalize):
+        """Returns True when the object was unchanged or has been re-parsed from key."""
+        get_kwargs = {'Bucket': S3_BUCKET_NAME, 'Key': key}
+        if key == self.source_key and self.etag:
+            get_kwargs['IfNoneMatch'] = self.etag
+        try:
+            with INSTRUMENTATION.timer("schedule_download"):
+                response = get_s3_client().get_object(**get_kwargs)
+                body = response['Body'].read()
+        except ClientError as e:
+            if not is_not_modified(e):
+                raise
+            self.stats["not_modified"] += 1
+            return True
+
+        with INSTRUMENTATION.timer("schedule_parse"):
+            document = parse(body)
+        with INSTRUMENTATION.timer("schedule_generalize"):
+            self.nodes = generalize(document)
+        self.source_key = key
+        self.etag = response.get('ETag')
+        self.stats["reloads"] += 1
+        INSTRUMENTATION.info(f"{key} loaded", schedule_nodes=len(self.nodes))
+        return True
+
+# Loaded on first use; routes that never read the schedule never download it
+SCHEDULE_CACHE = ScheduleCache(SCHEDULE_CACHE_TTL_SECONDS)
+
+class TTLCache:
+    """Per-container key/value cache whose entries expire ttl_seconds after they were stored.
+
+    The oldest entries are evicted once max_entries is reached, so a long-lived container
+    serving many webhooks keeps a bounded footprint.
+    """
+
+    def __init__(self, ttl_seconds, max_entries=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {} # key -> (stored_at, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic(), value)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+ABBREVIATIONS = {
+    "Splat Zones": "SZ",
+    "Tower Control": "TC",
+    "Rainmaker": "RM",
+    "Clam Blitz": "CB"
+}
+
+# watermark is the newest node start the rule has already been evaluated against (0 for none)
+CompiledRule = namedtuple("CompiledRule", ["notification_message", "notify_type", "selected_maps", "watermark"])
+
+def rule_watermark_key(rule):
+    """Stable key for a rule's delivery watermark; editing the rule starts it over."""
+    return hashlib.sha256(json.dumps(rule, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def build_rule_index(rules, watermarks=None):
+    """Compiles rules into a dict keyed by (matchType, vsRule id, HH:MMZ slot) of candidate CompiledRules."""
+    rule_index = {}
+    for rule in rules:
+        watermark = watermarks.get(rule_watermark_key(rule), 0) if watermarks else 0
+        for vs_rule_id, is_enabled in rule['battleModes'].items():
+            if not is_enabled:
+                continue
+            rule_map_details = rule['maps'].get(vs_rule_id)
+            if not rule_map_details:
+                continue
+
+            compiled_rule = CompiledRule(
+                rule['notificationMessage'],
+                rule_map_details['notifyType'],
+                frozenset(rule_map_details['selectedMaps']),
+                watermark
+            )
+            # dict.fromkeys drops duplicate slots so a rule matches a node at most once
+            for slot in dict.fromkeys(rule['timeSlots']):
+                rule_index.setdefault((rule['matchType'], vs_rule_id, slot), []).append(compiled_rule)
+    return rule_index
+
+# A rendered Discord message and the start times of the nodes it announces
+Notification = namedtuple("Notification", ["content", "node_starts"])
+
+def next_watermarks(rules, timestamp, nodes, watermarks=None):
+    """Returns the watermarks after evaluating rules against every node starting after timestamp."""
+    newest_start = nodes[0].start if nodes and nodes[0].start > parse_epoch(timestamp) else 0
+    watermarks = watermarks or {}
+    next_marks = {}
+    for rule in rules:
+        key = rule_watermark_key(rule)
+        next_marks[key] = max(watermarks.get(key, 0), newest_start)
+    return next_marks
 
-except Exception as e:
-    print(f"Error loading or processing {DATA_FILE_KEY} from S3 during init: {e}")
+def build_notifications(payload, timestamp, nodes=None, watermarks=None):
+    """Returns the rendered Notifications for a subscriber, or None if the payload is unusable.
 
-def process_notifications(payload, timestamp):
+    With watermarks, each rule only matches nodes newer than the one it was last evaluated against.
+    """
     webhook_url = payload.get('webhook_url')
     rules = payload.get('data', {}).get('rules', [])
 
     if not webhook_url or not rules:
-        return False
+        return None
+
+    if nodes is None:
+        nodes = SCHEDULE_CACHE.get_nodes()
     
-    notifications = {}
+    with INSTRUMENTATION.timer("match"):
+        notifications = match_rules(rules, timestamp, nodes, watermarks)
+    with INSTRUMENTATION.timer("render"):
+        return render_notifications(notifications)
 
-    current_dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-    if current_dt.tzinfo is None: # Ensure current_dt is timezone-aware
-        current_dt = current_dt.replace(tzinfo=timezone.utc)
+def maps_match(notify_type, selected_maps, map_ids):
+    """Whether a node's stages satisfy a rule's map selection (a frozenset) for its notifyType."""
+    if notify_type == "at-least-one":
+        return any(map_id in selected_maps for map_id in map_ids)
+    if notify_type == "two-same-rotation":
+        return len(map_ids) == 2 and selected_maps.issuperset(map_ids)
+    return False
 
-    for node in GENERALIZED_SCHEDULE_NODES:
-        node_start_dt = datetime.fromisoformat(node['startTime'].replace('Z', '+00:00'))
-        if node_start_dt.tzinfo is None: # Ensure node_start_dt is timezone-aware
-            node_start_dt = node_start_dt.replace(tzinfo=timezone.utc)
-        
-        if node_start_dt <= current_dt:
-            break
+def match_rules(rules, timestamp, nodes, watermarks=None):
+    """Returns a dict of notification message -> matched nodes for one subscriber's rules."""
+    notifications = {}
+    rule_index = build_rule_index(rules, watermarks)
+    cutoff = parse_epoch(timestamp)
+    if watermarks:
+        # Nodes at or below every rule's watermark were already evaluated in an earlier run
+        cutoff = max(cutoff, min(watermarks.get(rule_watermark_key(rule), 0) for rule in rules))
 
-        battle_mode_name = node['matchSettings']['vsRule']['name']
-        map_names = [stage['name'] for stage in node['matchSettings']['vsStages']]
-        map_ids = [stage['id'] for stage in node['matchSettings']['vsStages']]
+    for node in upcoming_nodes(nodes, cutoff):
+        # Check matchType, battleModes and timeSlots (ignore date) with a single lookup
+        candidate_rules = rule_index.get((node.match_type, node.rule_id, node.slot))
+        if not candidate_rules:
+            continue
 
-        for rule in rules:
-            # Check matchType
-            if rule['matchType'] != node['matchType']:
+        map_ids = node.stage_ids
+        for compiled_rule in candidate_rules:
+            if node.start <= compiled_rule.watermark:
                 continue
 
-            # Check battleModes
-            vs_rule_id = node['matchSettings']['vsRule']['id']
-            if vs_rule_id not in rule['battleModes'] or not rule['battleModes'][vs_rule_id]:
-                continue
-            
-            # Check timeSlots (ignore date)
-            node_time_str = node_start_dt.strftime("%H:%M") + "Z"
-            if node_time_str not in rule['timeSlots']:
-                continue
-
-            # Check maps
-            rule_map_details = rule['maps'].get(vs_rule_id)
-            if not rule_map_details:
-                continue
-            
-            notify_type = rule_map_details['notifyType']
-            selected_maps = rule_map_details['selectedMaps']
-            
-            map_match = False
-            if notify_type == "at-least-one":
-                if any(map_id in selected_maps for map_id in map_ids):
-                    map_match = True
-            elif notify_type == "two-same-rotation":
-                if all(map_id in selected_maps for map_id in map_ids) and len(map_ids) == 2:
-                    map_match = True
-            
-            if not map_match:
+            if not maps_match(compiled_rule.notify_type, compiled_rule.selected_maps, map_ids):
                 continue
 
             # If all criteria met, add to notifications dict
-            notification_message_key = rule['notificationMessage']
+            notification_message_key = compiled_rule.notification_message
             if notification_message_key not in notifications:
                 notifications[notification_message_key] = []
             notifications[notification_message_key].append(node)
-    
-    if not notifications:
-        return True # Return True even if no notifications, as processing was successful.
-
-    ABBREVIATIONS = {
-        "Splat Zones": "SZ",
-        "Tower Control": "TC",
-        "Rainmaker": "RM",
-        "Clam Blitz": "CB"
-    }
 
+    return notifications
+
+def render_notifications(notifications):
+    """Renders a dict of notification message -> matched nodes into Notifications, one per message."""
+    messages = []
     for notification_message, matched_nodes_list in notifications.items():
         message_parts = [notification_message]
-        # Sort matched_nodes_list by startTime for consistent chronological order for discord pings.
-        matched_nodes_list.sort(key=lambda x: datetime.fromisoformat(x['startTime'].replace('Z', '+00:00')))
+        # Sort matched_nodes_list by start for consistent chronological order for discord pings.
+        matched_nodes_list.sort(key=lambda x: x.start)
 
         for matched_node in matched_nodes_list:
-            node_start_dt = datetime.fromisoformat(matched_node['startTime'].replace('Z', '+00:00'))
-            unix_timestamp = int(node_start_dt.timestamp())
-            node_end_dt = datetime.fromisoformat(matched_node['endTime'].replace('Z', '+00:00'))
-            if node_end_dt.tzinfo is None: # Ensure node_end_dt is timezone-aware
-                node_end_dt = node_end_dt.replace(tzinfo=timezone.utc)
-            unix_end_timestamp = int(node_end_dt.timestamp())
-            
-            summary_battle_mode_name = matched_node['matchSettings']['vsRule']['name']
             # Apply abbreviation
-            summary_battle_mode_name_abbreviated = ABBREVIATIONS.get(summary_battle_mode_name, summary_battle_mode_name)
+            summary_battle_mode_name_abbreviated = ABBREVIATIONS.get(matched_node.rule_name, matched_node.rule_name)
 
-            summary_match_type = matched_node['matchType']
-            summary_map_names = ", ".join([stage['name'] for stage in matched_node['matchSettings']['vsStages']])
-            summary_timeslot = f"<t:{unix_timestamp}:f> - <t:{unix_end_timestamp}:T>"
+            summary_map_names = ", ".join(matched_node.stage_names)
+            summary_timeslot = f"<t:{matched_node.start}:f> - <t:{matched_node.end}:T>"
             
             message_parts.append(
-                f"-  **{summary_timeslot}**: {summary_map_names} {summary_battle_mode_name_abbreviated} ({summary_match_type})"
+                f"-  **{summary_timeslot}**: {summary_map_names} {summary_battle_mode_name_abbreviated} ({matched_node.match_type})"
             )
         
-        full_message = "\n".join(message_parts)
-        send_discord_message(webhook_url, full_message)
+        messages.append(Notification("\n".join(message_parts), [matched_node.start for matched_node in matched_nodes_list]))
+    
+    return messages
+
+def pack_notifications(notifications):
+    """Merges a subscriber's rendered notifications into as few webhook payloads as Discord's limits allow."""
+    return pack_sections(notifications, use_embeds=NOTIFY_USE_EMBEDS)
+
+def enqueue_messages(webhook_url, messages):
+    """Queues packed messages in the outbox; returns how many were not already queued."""
+    queued = 0
+    for message in messages:
+        if get_outbox().enqueue(webhook_url, message.payload, message.node_starts):
+            queued += 1
+    return queued
+
+def process_notifications(payload, timestamp, nodes=None):
+    notifications = build_notifications(payload, timestamp, nodes)
+    if notifications is None:
+        return False
+
+    enqueue_messages(payload['webhook_url'], pack_notifications(notifications))
     
-    return True
+    return True # Return True even if no notifications, as processing was successful.
+
+def drain_deadline(context):
+    """Epoch seconds by which a drain has to stop so the invocation can return in time."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.time() + context.get_remaining_time_in_millis() / 1000 - OUTBOX_DRAIN_MARGIN_SECONDS
+
+def upsert_webhook_schedule(schedule_name, webhook_url, data):
+    schedule_kwargs = {
+        'FlexibleTimeWindow': {'Mode': 'OFF'},
+        'Name': schedule_name,
+        'GroupName': EVENTBRIDGE_SCHEDULE_GROUP_NAME,
+        'Description': f"Schedule for webhook {webhook_url}",
+        'ScheduleExpression': 'cron(10 0/2 * * ? *)',
+        'Target': {
+            'Arn': DESTINATION_LAMBDA_ARN,
+            'RoleArn': EVENTBRIDGE_ROLE_ARN,
+            'Input': json.dumps({
+                'webhook_url': webhook_url,
+                'data': data
+            })
+        },
+        'State': 'ENABLED',
+        'ActionAfterCompletion': 'NONE'
+    }
+    scheduler_client = get_scheduler_client()
+    try:
+        scheduler_client.create_schedule(**schedule_kwargs)
+        return True
+    except scheduler_client.exceptions.ConflictException:
+        # If schedule exists, update it
+        scheduler_client.update_schedule(**schedule_kwargs)
+        return False
+
+def delete_webhook_schedule(schedule_name):
+    scheduler_client = get_scheduler_client()
+    try:
+        scheduler_client.delete_schedule(Name=schedule_name, GroupName=EVENTBRIDGE_SCHEDULE_GROUP_NAME)
+    except scheduler_client.exceptions.ResourceNotFoundException:
+        pass
+    except Exception as e:
+        INSTRUMENTATION.error("Error deleting EventBridge schedule", schedule=schedule_name, error=str(e))
+
+def iter_subscriptions(segment=None, total_segments=None):
+    """Pages through every subscriber in the webhooks table that is handled by the batch sweep.
+
+    With a segment, only that shard of a parallel scan is read; DynamoDB assigns items to
+    segments by a hash of their partition key, the webhook URL.
+    """
+    scan_kwargs = {}
+    if segment is not None:
+        scan_kwargs.update(Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = get_table().scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            # Subscribers that still own a per-webhook schedule are notified by it, not by the sweep
+            if item.get('schedule') or not item.get('config'):
+                continue
+            yield item
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+def save_watermarks(webhook_url, watermarks):
+    try:
+        get_table().update_item(
+            Key={'webhook_url': webhook_url},
+            UpdateExpression="SET watermarks = :watermarks",
+            # Skip subscribers that were deleted while the sweep was running
+            ConditionExpression="attribute_exists(webhook_url)",
+            ExpressionAttributeValues={':watermarks': watermarks}
+        )
+    except Exception as e:
+        INSTRUMENTATION.error("Error saving delivery watermarks for a subscriber", webhook=webhook_log_id(webhook_url), error=str(e))
+
+# What /check-webhook needs from a subscriber's item; validated_at is the epoch second of the last accepted message
+WebhookConfig = namedtuple("WebhookConfig", ["exists", "config", "config_version", "validated_at"])
+MISSING_WEBHOOK_CONFIG = WebhookConfig(False, None, 0, 0)
+
+WEBHOOK_CONFIG_CACHE = TTLCache(CONFIG_CACHE_TTL_SECONDS)
+# Covers webhooks without an item yet, whose validation cannot be recorded in DynamoDB
+WEBHOOK_VALIDATION_CACHE = TTLCache(WEBHOOK_VALIDATION_TTL_SECONDS)
+
+def webhook_config_from_item(item):
+    # The resource layer returns numbers as Decimal
+    return WebhookConfig(True, item['config'], int(item.get('config_version', 0)), int(item.get('validated_at', 0)))
+
+def migrate_schedule_config(webhook_url, schedule_name):
+    """Copies the rules of a subscriber saved before configs lived on the item out of its schedule input."""
+    try:
+        schedule_response = get_scheduler_client().get_schedule(
+            Name=schedule_name,
+            GroupName=EVENTBRIDGE_SCHEDULE_GROUP_NAME
+        )
+    except get_scheduler_client().exceptions.ResourceNotFoundException:
+        INSTRUMENTATION.error("Schedule not found for webhook", schedule=schedule_name, webhook=webhook_log_id(webhook_url))
+        return None
+    config = json.loads(schedule_response['Target']['Input']).get('data', {})
+    # Later lookups are answered from the item alone; a concurrent submit keeps its newer config
+    get_table().update_item(
+        Key={'webhook_url': webhook_url},
+        UpdateExpression="SET config = if_not_exists(config, :config), config_version = if_not_exists(config_version, :one)",
+        ConditionExpression="attribute_exists(webhook_url)",
+        ExpressionAttributeValues={':config': config, ':one': 1}
+    )
+    return config
+
+def load_webhook_config(webhook_url):
+    """Returns the subscriber's WebhookConfig with one get_item, served from memory while it is fresh."""
+    cached = WEBHOOK_CONFIG_CACHE.get(webhook_url)
+    if cached is not None:
+        return cached
+
+    item = get_table().get_item(Key={'webhook_url': webhook_url}).get('Item')
+    if item and 'config' not in item and item.get('schedule'):
+        config = migrate_schedule_config(webhook_url, item['schedule'])
+        item = dict(item, config=config, config_version=1) if config is not None else None
+    entry = webhook_config_from_item(item) if item and 'config' in item else MISSING_WEBHOOK_CONFIG
+    WEBHOOK_CONFIG_CACHE.put(webhook_url, entry)
+    return entry
+
+def is_webhook_validated(webhook_url, entry, now):
+    validated_at = max(entry.validated_at, WEBHOOK_VALIDATION_CACHE.get(webhook_url) or 0)
+    return now - validated_at < WEBHOOK_VALIDATION_TTL_SECONDS
+
+def record_webhook_validated(webhook_url, entry, now):
+    WEBHOOK_VALIDATION_CACHE.put(webhook_url, now)
+    if not entry.exists:
+        return
+    WEBHOOK_CONFIG_CACHE.put(webhook_url, entry._replace(validated_at=now))
+    try:
+        get_table().update_item(
+            Key={'webhook_url': webhook_url},
+            UpdateExpression="SET validated_at = :validated_at",
+            ConditionExpression="attribute_exists(webhook_url)",
+            ExpressionAttributeValues={':validated_at': now}
+        )
+    except Exception as e:
+        INSTRUMENTATION.error("Error recording webhook validation", webhook=webhook_log_id(webhook_url), error=str(e))
+
+def store_webhook_config(webhook_url, data, schedule_name, timestamp, validated_at=None):
+    """Writes a submitted config to the webhook's item.
+
+    Returns (config_version, changed). Re-submitting the stored config leaves the item and its
+    config_version untouched, so repeated submits do not trigger another initial notification.
+    """
+    # The stored config is only the canonical rules, so their fingerprint identifies it
+    fields = {
+        'config': data,
+        'rules_fingerprint': rules_fingerprint(data['rules']),
+        'updated_at': timestamp
+    }
+    if validated_at is not None:
+        fields['validated_at'] = validated_at
+    # Watermarks belong to the previous config; the initial stage sets new ones
+    removed = ['watermarks']
+    if PER_WEBHOOK_SCHEDULES:
+        fields['schedule'] = schedule_name
+    else:
+        removed.append('schedule')
+
+    values = {f":{name}": value for name, value in fields.items()}
+    values[':one'] = 1
+    try:
+        response = get_table().update_item(
+            Key={'webhook_url': webhook_url},
+            UpdateExpression="SET " + ", ".join(f"#{name} = :{name}" for name in fields)
+                + " ADD config_version :one REMOVE " + ", ".join(f"#{name}" for name in removed),
+            ConditionExpression="attribute_not_exists(rules_fingerprint) OR rules_fingerprint <> :rules_fingerprint",
+            ExpressionAttributeNames={f"#{name}": name for name in list(fields) + removed},
+            ExpressionAttributeValues=values,
+            ReturnValues="UPDATED_NEW"
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        return store_unchanged_webhook_config(webhook_url, schedule_name, validated_at), False
+    return int(response['Attributes']['config_version']), True
+
+def store_unchanged_webhook_config(webhook_url, schedule_name, validated_at):
+    """Applies the schedule ownership of a resubmitted, unchanged config and returns its config_version.
+
+    The submission already created or deleted the EventBridge schedule, so the item has to follow
+    even when the config did not change: an item that keeps a deleted schedule is skipped by the
+    sweep and never notified again.
+    """
+    fields = {}
+    if validated_at is not None:
+        fields['validated_at'] = validated_at
+    if PER_WEBHOOK_SCHEDULES:
+        fields['schedule'] = schedule_name
+    update_expression = "SET " + ", ".join(f"#{name} = :{name}" for name in fields) if fields else ""
+    if not PER_WEBHOOK_SCHEDULES:
+        update_expression += " REMOVE #schedule"
+    update_kwargs = {'ExpressionAttributeValues': {f":{name}": value for name, value in fields.items()}} if fields else {}
+    response = get_table().update_item(
+        Key={'webhook_url': webhook_url},
+        UpdateExpression=update_expression.strip(),
+        # Fails rather than recreating a subscriber deleted since the conditional write
+        ConditionExpression="attribute_exists(webhook_url)",
+        ExpressionAttributeNames={f"#{name}": name for name in list(fields) + ['schedule']},
+        ReturnValues="ALL_NEW",
+        **update_kwargs
+    )
+    return int(response['Attributes'].get('config_version', 0))
+
+def send_submit_validation(webhook_url, now):
+    """Posts the initializing message without waiting out long rate limits.
+
+    Returns the DeliveryResult, or None when the webhook accepted a message recently enough
+    that it does not need to be validated again.
+    """
+    entry = WEBHOOK_CONFIG_CACHE.get(webhook_url) or MISSING_WEBHOOK_CONFIG
+    if is_webhook_validated(webhook_url, entry, now):
+        return None
+    return DELIVERY_ENGINE.send(webhook_url, {"content": "Initializing Splat-Notifyer Webhook..."}, max_wait=SUBMIT_VALIDATION_MAX_WAIT_SECONDS)
+
+def start_initial_notifications(webhook_url, config_version, context=None):
+    """Hands a new config's first notifications to the notifier Lambda without waiting for them."""
+    event = {"mode": "initial", "webhook_url": webhook_url, "config_version": config_version}
+    if not DESTINATION_LAMBDA_ARN:
+        # No notifier to hand off to, e.g. when running locally
+        return run_initial_notifications(event, context)
+    get_lambda_client().invoke(
+        FunctionName=DESTINATION_LAMBDA_ARN,
+        InvocationType='Event',
+        Payload=json.dumps(event).encode('utf-8')
+    )
+
+def run_initial_notifications(event, context):
+    """Announces every upcoming match for a freshly submitted config, unless a newer submit superseded it."""
+    webhook_url = event['webhook_url']
+    item = get_table().get_item(Key={'webhook_url': webhook_url}, ConsistentRead=True).get('Item')
+    if not item or 'config' not in item:
+        return {"status": "missing"}
+    if int(item.get('config_version', 0)) != int(event.get('config_version', 0)):
+        # The newer submission queued its own initial stage
+        return {"status": "superseded"}
+
+    current_timestamp = datetime.now(timezone.utc).isoformat()
+    # The watermarks must cover exactly the nodes evaluated here, even if the cache reloads meanwhile
+    nodes = SCHEDULE_CACHE.get_nodes()
+    if not process_notifications({"webhook_url": webhook_url, "data": item['config']}, current_timestamp, nodes):
+        return {"status": "failed"}
+    if not item.get('schedule') and NOTIFY_MODE == "incremental":
+        # The sweep starts after the nodes announced here
+        save_watermarks(webhook_url, next_watermarks(item['config'].get('rules', []), current_timestamp, nodes))
+    delivery = get_outbox().drain(DELIVERY_ENGINE, deadline=drain_deadline(context), webhook_url=webhook_url)
+    return {"status": "processed", "delivery": delivery}
+
+def run_batch_sweep(timestamp, subscriptions=None):
+    """Evaluates every subscriber (or the given subscriber items) against the loaded schedule once and queues their notifications.
+
+    Subscribers with the same canonical rules (and, in incremental mode, the same watermarks) get
+    the same notifications, so each distinct configuration is added to a SubscriptionStore once
+    and the whole store is matched node by node.
+    """
+    stats = {"subscribers": 0, "distinct_configs": 0, "messages": 0, "queued": 0, "watermarks_advanced": 0}
+    nodes = SCHEDULE_CACHE.get_nodes()
+    incremental = NOTIFY_MODE == "incremental"
+    store = SubscriptionStore()
+    configs = {} # (rules fingerprint, watermarks) -> store subscriber index
+    config_rules = []
+    subscribers = [] # (webhook_url, store subscriber index, watermarks)
+
+    for item in iter_subscriptions() if subscriptions is None else subscriptions:
+        stats["subscribers"] += 1
+        # Subscribers saved before rules were canonicalized at submit are canonicalized here
+        rules = item['config'].get('rules', [])
+        fingerprint = item.get('rules_fingerprint')
+        # The resource layer returns numbers as Decimal
+        watermarks = {key: int(value) for key, value in item.get('watermarks', {}).items()} if incremental else None
+        try:
+            if not fingerprint:
+                rules = canonicalize_rules(rules)
+                fingerprint = rules_fingerprint(rules)
+            config_key = (fingerprint, frozenset(watermarks.items()) if watermarks else None)
+            if config_key not in configs:
+                with INSTRUMENTATION.timer("store_add"):
+                    configs[config_key] = store.add(rules, watermarks, rule_watermark_key)
+                config_rules.append(rules)
+        except Exception as e:
+            INSTRUMENTATION.error("Error matching notifications for a subscriber", webhook=webhook_log_id(item['webhook_url']), error=str(e))
+            continue
+        subscribers.append((item['webhook_url'], configs[config_key], watermarks))
+    stats["distinct_configs"] = store.subscriber_count
+
+    cutoff = parse_epoch(timestamp)
+    with INSTRUMENTATION.timer("match"):
+        matches = store.match(upcoming_nodes(nodes, cutoff))
+    with INSTRUMENTATION.timer("render"):
+        packed = [pack_notifications(render_notifications(subscriber_matches)) for subscriber_matches in matches]
+    updated = {}
+
+    for webhook_url, config, watermarks in subscribers:
+        messages = packed[config]
+        if messages:
+            stats["messages"] += len(messages)
+            stats["queued"] += enqueue_messages(webhook_url, messages)
+
+        # Only advanced once the notifications are durably queued
+        if incremental:
+            if config not in updated:
+                updated[config] = next_watermarks(config_rules[config], timestamp, nodes, watermarks)
+            if updated[config] != watermarks:
+                save_watermarks(webhook_url, updated[config])
+                stats["watermarks_advanced"] += 1
+
+    INSTRUMENTATION.info("Batch sweep finished", stats=stats, schedule_cache=SCHEDULE_CACHE.stats)
+    return stats
+
+def current_sweep_id(now):
+    """Names the sweep of the schedule interval now falls in, so every coordinator run in it shares the same shards."""
+    slot = now.replace(hour=now.hour - now.hour % SWEEP_INTERVAL_HOURS, minute=0, second=0, microsecond=0)
+    return f"sweep-{slot.strftime('%Y-%m-%dT%H')}"
+
+def process_sweep_shard(shard, shard_count, timestamp):
+    return run_batch_sweep(timestamp, iter_subscriptions(segment=shard, total_segments=shard_count))
+
+def start_sweep_worker(sweep_id, context):
+    """Invokes another notifier asynchronously as a sweep worker; without a Lambda context the worker runs inline."""
+    event = {"mode": "worker", "sweep_id": sweep_id}
+    function_arn = getattr(context, 'invoked_function_arn', None)
+    if not function_arn:
+        return run_sweep_worker(event, context)
+    get_lambda_client().invoke(
+        FunctionName=function_arn,
+        InvocationType='Event',
+        Payload=json.dumps(event).encode('utf-8')
+    )
+
+def run_sweep_coordinator(context):
+    """Starts this interval's sharded sweep, or resumes it, with one worker per claimable shard.
+
+    Run again later in the interval, it hands shards whose workers failed or timed out to new workers.
+    """
+    now = datetime.now(timezone.utc)
+    sweep_id = current_sweep_id(now)
+    coordinator = get_shard_coordinator()
+    coordinator.start(sweep_id, SWEEP_SHARDS, (now + timedelta(hours=NOTIFY_LOOKAHEAD_HOURS)).isoformat())
+    claimable = len(coordinator.claimable(sweep_id))
+    for _ in range(claimable):
+        start_sweep_worker(sweep_id, context)
+    progress = coordinator.progress(sweep_id)
+    INSTRUMENTATION.info("Sweep coordinator finished", sweep_id=sweep_id, workers_started=claimable, progress=progress)
+    return {"sweep_id": sweep_id, "workers_started": claimable, "progress": progress}
+
+def run_sweep_worker(event, context):
+    owner = getattr(context, 'aws_request_id', None) or f"local-{os.getpid()}-{threading.get_ident()}"
+    processed = get_shard_coordinator().run_worker(event['sweep_id'], owner, process_sweep_shard, deadline=drain_deadline(context))
+    delivery = get_outbox().drain(DELIVERY_ENGINE, deadline=drain_deadline(context))
+    INSTRUMENTATION.info("Sweep worker finished", sweep_id=event['sweep_id'], shards=processed, delivery=delivery)
+    return {"sweep_id": event['sweep_id'], "shards": processed, "delivery": delivery}
+
+def describe_node(node):
+    return {"start": node.start, "end": node.end, "matchType": node.match_type, "rule": node.rule_name, "stages": list(node.stage_names)}
+
+def parse_history_window(event):
+    """Returns ((start, end), None) for the event's ISO start and end times, or (None, error message)."""
+    window = []
+    for name in ('start', 'end'):
+        value = event.get(name)
+        if not isinstance(value, str) or not value:
+            return None, f"{name} is required and must be an ISO 8601 time."
+        try:
+            window.append(parse_epoch(value))
+        except ValueError:
+            return None, f"{name} is not a valid ISO 8601 time."
+    if window[0] >= window[1]:
+        return None, "start must be before end."
+    return tuple(window), None
+
+def replay_rules(rules, start, end):
+    """Matches canonical rules against the archived rotations that started in [start, end).
+
+    Every rotation in the window is evaluated once, as a full-mode sweep would have seen it, so a
+    rule change can be checked against weeks or months of real schedules.
+    """
+    with INSTRUMENTATION.timer("history_load"):
+        snapshot = get_schedule_history().load(start, end)
+        nodes = generalize_schedule_snapshot(snapshot) if snapshot['nodes'] else []
+    with INSTRUMENTATION.timer("match"):
+        matches = match_rules(rules, datetime.fromtimestamp(start - 1, timezone.utc).isoformat(), nodes)
+    return {
+        "start": start,
+        "end": end,
+        "rotations": len(nodes),
+        "matches": [
+            {
+                "notificationMessage": message,
+                "count": len(matched_nodes),
+                "rotations": [describe_node(node) for node in sorted(matched_nodes, key=lambda node: node.start)]
+            }
+            for message, matched_nodes in matches.items()
+        ]
+    }
+
+def query_history(start, end, criteria):
+    """Counts the archived rotations that started in [start, end) and match every given criterion.
+
+    criteria holds any of matchType, rule (vsRule id), stage (stage id) and slot (HH:00Z), so
+    questions like how often a stage came up in a mode at a given time can be answered from the
+    index without a full scan of the window.
+    """
+    with INSTRUMENTATION.timer("history_load"):
+        index = get_schedule_history().index(start, end)
+    with INSTRUMENTATION.timer("history_query"):
+        snapshot = index.query_snapshot(
+            match_type=criteria.get('matchType'),
+            rule_id=criteria.get('rule'),
+            stage_id=criteria.get('stage'),
+            slot=criteria.get('slot')
+        )
+        nodes = generalize_schedule_snapshot(snapshot) if snapshot['nodes'] else []
+    by_slot = {}
+    by_stage = {}
+    for node in nodes:
+        by_slot[node.slot] = by_slot.get(node.slot, 0) + 1
+        for stage_name in node.stage_names:
+            by_stage[stage_name] = by_stage.get(stage_name, 0) + 1
+    return {
+        "start": start,
+        "end": end,
+        "rotations": len(index.nodes),
+        "count": len(nodes),
+        "bySlot": dict(sorted(by_slot.items())),
+        "byStage": dict(sorted(by_stage.items(), key=lambda pair: -pair[1])),
+        "matches": [describe_node(node) for node in reversed(nodes)]
+    }
+
+def validate_history_criteria(event):
+    """Returns the event's history criteria and None, or None and an error message."""
+    allowed = {
+        'matchType': MATCH_TYPES,
+        'rule': RULES_SCHEMA.mode_ids,
+        'stage': RULES_SCHEMA.stage_ids,
+        'slot': TIME_SLOTS
+    }
+    criteria = {}
+    for name, values in allowed.items():
+        value = event.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, str) or value not in values:
+            return None, f"{name} '{value}' is not known."
+        criteria[name] = value
+    return criteria, None
+
+class PreviewIndex:
+    """Answers /preview-rules from the upcoming schedule nodes keyed by (matchType, vsRule id, slot).
+
+    The index is rebuilt once per schedule reload, so a preview only looks up the keys of the
+    submitted rules instead of running the matching loop over every node. Responses are cached
+    by the canonical rules' fingerprint until the next reload; rotations that have started since
+    are dropped when a cached response is served.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._nodes = None
+        self._index = {}
+        self._responses = TTLCache(float("inf"), max_entries)
+
+    def _refresh(self):
+        nodes = SCHEDULE_CACHE.get_nodes()
+        if nodes is self._nodes:
+            return
+        with self._lock:
+            if nodes is self._nodes:
+                return
+            index = {}
+            # nodes are sorted by start descending; each key keeps its nodes oldest first
+            for node in reversed(nodes):
+                index.setdefault((node.match_type, node.rule_id, node.slot), []).append(node)
+            self._index = index
+            self._responses = TTLCache(float("inf"), self.max_entries)
+            self._nodes = nodes
+
+    def _match_rule(self, rule):
+        matched = []
+        for mode_id in rule['battleModes']:
+            map_details = rule['maps'][mode_id]
+            selected_maps = frozenset(map_details['selectedMaps'])
+            for slot in rule['timeSlots']:
+                for node in self._index.get((rule['matchType'], mode_id, slot), ()):
+                    if maps_match(map_details['notifyType'], selected_maps, node.stage_ids):
+                        matched.append(node)
+        matched.sort(key=lambda node: node.start)
+        return matched
+
+    def preview(self, canonical_rules, now):
+        """Returns, per rule, the upcoming rotations it would announce."""
+        self._refresh()
+        fingerprint = rules_fingerprint(canonical_rules)
+        matches = self._responses.get(fingerprint)
+        if matches is None:
+            INSTRUMENTATION.add("preview_cache_miss")
+            matches = [self._match_rule(rule) for rule in canonical_rules]
+            self._responses.put(fingerprint, matches)
+        return [
+            {
+                "notificationMessage": rule['notificationMessage'],
+                "rotations": [describe_node(node) for node in rule_matches if node.start > now]
+            }
+            for rule, rule_matches in zip(canonical_rules, matches)
+        ]
+
+PREVIEW_INDEX = PreviewIndex()
+
+_COLD_START = True
+
+def report_cold_start(route):
+    """Prints the initialization breakdown once per container, after its first invocation."""
+    global _COLD_START
+    if not _COLD_START:
+        return
+    _COLD_START = False
+    INSTRUMENTATION.add("cold_start")
+    # module_import covers the whole module import, imports included; lazy clients are created inside the invocation
+    INSTRUMENTATION.add("cold_start_ms", STARTUP_TIMINGS.get("module_import", 0), "Milliseconds")
+    INSTRUMENTATION.info("Cold start", route=route, init_ms=STARTUP_TIMINGS)
 
 def lambda_handler(event, context):
-    print(f"Received event: {json.dumps(event)}")
+    route = event.get('mode') or 'per-webhook'
+    INSTRUMENTATION.start_invocation(Route=route)
+    try:
+        return run_notifier(event, context)
+    finally:
+        report_cold_start(route)
+        INSTRUMENTATION.flush()
+
+def run_notifier(event, context):
+    # The event can hold a webhook URL and its whole config, so only its shape is logged
+    INSTRUMENTATION.debug("Received event", mode=event.get('mode'), keys=sorted(event))
+
+    if event.get('mode') == 'batch':
+        future_timestamp = datetime.now(timezone.utc) + timedelta(hours=NOTIFY_LOOKAHEAD_HOURS)
+        stats = run_batch_sweep(future_timestamp.isoformat())
+        stats["delivery"] = get_outbox().drain(DELIVERY_ENGINE, deadline=drain_deadline(context))
+        return {
+            'statusCode': 200,
+            'body': json.dumps(stats)
+        }
+
+    if event.get('mode') == 'coordinator':
+        return {
+            'statusCode': 200,
+            'body': json.dumps(run_sweep_coordinator(context))
+        }
+
+    if event.get('mode') == 'worker':
+        return {
+            'statusCode': 200,
+            'body': json.dumps(run_sweep_worker(event, context))
+        }
+
+    if event.get('mode') == 'replay':
+        # Invoked by hand: {"mode": "replay", "rules": [...], "start": ISO time, "end": ISO time}
+        is_valid, message, rules = RULES_SCHEMA.validate_rules(event.get('rules'))
+        if not is_valid:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({"message": f"Invalid rules: {message}"})
+            }
+        window, message = parse_history_window(event)
+        if window is None:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({"message": f"Invalid window: {message}"})
+            }
+        return {
+            'statusCode': 200,
+            'body': json.dumps(replay_rules(rules, *window))
+        }
+
+    if event.get('mode') == 'history':
+        # Invoked by hand: {"mode": "history", "start": ISO time, "end": ISO time, plus any of
+        # "matchType", "rule", "stage" and "slot"}
+        window, message = parse_history_window(event)
+        if window is None:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({"message": f"Invalid window: {message}"})
+            }
+        criteria, message = validate_history_criteria(event)
+        if criteria is None:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({"message": f"Invalid criteria: {message}"})
+            }
+        return {
+            'statusCode': 200,
+            'body': json.dumps(query_history(*window, criteria))
+        }
+
+    if event.get('mode') == 'initial':
+        # Queued by /submit-webhook so submissions return without waiting on Discord
+        stats = run_initial_notifications(event, context)
+        INSTRUMENTATION.info("Initial notifications finished", stats=stats)
+        return {
+            'statusCode': 500 if stats["status"] == "failed" else 200,
+            'body': json.dumps(stats)
+        }
+
+    if event.get('mode') == 'drain':
+        # Scheduled drain stage: delivers retries that earlier runs deferred
+        stats = get_outbox().drain(DELIVERY_ENGINE, deadline=drain_deadline(context))
+        INSTRUMENTATION.info("Outbox drain finished", stats=stats)
+        return {
+            'statusCode': 200,
+            'body': json.dumps(stats)
+        }
     
     webhook_url = event.get('webhook_url')
     data_payload = event.get('data')
     
     if not webhook_url or not data_payload:
-        print("Webhook URL or data payload missing from lambda event.")
+        INSTRUMENTATION.warning("Webhook URL or data payload missing from lambda event.")
         return {
             'statusCode': 400,
             'body': json.dumps('Invalid event payload for notifications.')
         }
 
     # Calculate timestamp 22 hours in the future from now (UTC)
-    future_timestamp = datetime.now(timezone.utc) + timedelta(hours=20)
+    future_timestamp = datetime.now(timezone.utc) + timedelta(hours=NOTIFY_LOOKAHEAD_HOURS)
     
     full_notification_payload = {
         "webhook_url": webhook_url,
@@ -311,6 +1130,8 @@ def lambda_handler(event, context):
     }
     
     result = process_notifications(full_notification_payload, future_timestamp.isoformat())
+    if result:
+        get_outbox().drain(DELIVERY_ENGINE, deadline=drain_deadline(context), webhook_url=webhook_url)
 
     if not result:
         return {
@@ -324,9 +1145,41 @@ def lambda_handler(event, context):
     }
 
 def handler(event, context):
+    route = f"{event.get('httpMethod')} {event.get('path')}"
+    INSTRUMENTATION.start_invocation(Route=route)
+    try:
+        return route_request(event, context)
+    finally:
+        report_cold_start(route)
+        INSTRUMENTATION.flush()
+
+def route_request(event, context):
     http_method = event.get('httpMethod')
     path = event.get('path')
-    body = json.loads(event.get('body') or str({})) # Sets if explicitly "None"
+    raw_body = event.get('body') or str({}) # Sets if explicitly "None"
+    try:
+        # The limit is on bytes, so multi-byte characters count for what they weigh on the wire
+        body_bytes = base64.b64decode(raw_body, validate=True) if event.get('isBase64Encoded') else raw_body.encode('utf-8')
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({"message": "Request body must be valid base64."})
+        }
+    if len(body_bytes) > MAX_BODY_BYTES:
+        return {
+            'statusCode': 413,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({"message": f"Request body cannot exceed {MAX_BODY_BYTES} bytes."})
+        }
+    try:
+        body = json.loads(body_bytes)
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({"message": "Request body must be valid JSON."})
+        }
 
     if path == '/check-webhook' and http_method == 'GET':
         query_params = event.get('queryStringParameters', {})
@@ -337,71 +1190,43 @@ def handler(event, context):
                 'body': json.dumps({"message": "Webhook URL is required."})
             }
 
-        print(f"DEBUG: Entering /check-webhook for URL: {webhook_url}")
-        # Validate webhook by sending a message
-        if not send_discord_message(webhook_url, "Validating Splat-Notifyer Webhook..."):
-            print(f"DEBUG: Webhook validation failed for URL: {webhook_url}")
+        INSTRUMENTATION.debug("Entering /check-webhook", webhook=webhook_log_id(webhook_url))
+        try:
+            entry = load_webhook_config(webhook_url)
+        except Exception as e:
+            INSTRUMENTATION.error("Error querying DynamoDB for webhook", webhook=webhook_log_id(webhook_url), error=str(e))
             return {
-                'statusCode': 400,
-                'body': json.dumps({"message": "Webhook Validation Failure"})
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({"message": "Internal server error during database query."})
             }
-        print(f"DEBUG: Webhook validated successfully for URL: {webhook_url}")
 
-        # Query DynamoDB
-        try:
-            print(f"DEBUG: Querying DynamoDB for webhook_url: {webhook_url}")
-            response = table.get_item(Key={'webhook_url': webhook_url})
-            item = response.get('Item')
-            print(f"DEBUG: DynamoDB response for {webhook_url}: {item}")
-            if item and 'schedule' in item:
-                schedule_name = item['schedule']
-                print(f"DEBUG: Found schedule {schedule_name} in DynamoDB for {webhook_url}")
-                try:
-                    print(f"DEBUG: Getting schedule details for {schedule_name}")
-                    schedule_response = scheduler_client.get_schedule(
-                        Name=schedule_name,
-                        GroupName=EVENTBRIDGE_SCHEDULE_GROUP_NAME
-                    )
-                    schedule_input_str = schedule_response['Target']['Input']
-                    schedule_input = json.loads(schedule_input_str)
-                    data_from_schedule = schedule_input.get('data', {})
-                    print(f"DEBUG: Retrieved data from schedule for {webhook_url}: {data_from_schedule}")
-                    return {
-                        'statusCode': 200,
-                        'headers': {'Content-Type': 'application/json'},
-                        'body': json.dumps({"exists": True, "config": data_from_schedule})
-                    }
-                except scheduler_client.exceptions.ResourceNotFoundException:
-                    print(f"ERROR: Schedule {schedule_name} not found for webhook {webhook_url}")
-                    return {
-                        'statusCode': 200,
-                        'headers': {'Content-Type': 'application/json'},
-                        'body': json.dumps({"exists": False})
-                    }
-                except Exception as e:
-                    print(f"ERROR: Error retrieving schedule for webhook {webhook_url}: {e}")
-                    return {
-                        'statusCode': 500,
-                        'headers': {'Content-Type': 'application/json'},
-                        'body': json.dumps({"message": "Internal server error during schedule retrieval."})
-                    }
-            else:
-                print(f"DEBUG: No schedule found in DynamoDB for webhook_url: {webhook_url}")
+        # Validate webhook by sending a message, unless it already accepted one recently
+        now = int(time.time())
+        if not is_webhook_validated(webhook_url, entry, now):
+            if not send_discord_message(webhook_url, "Validating Splat-Notifyer Webhook..."):
+                INSTRUMENTATION.debug("Webhook validation failed", webhook=webhook_log_id(webhook_url))
                 return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json'},
-                    'body': json.dumps({"exists": False})
+                    'statusCode': 400,
+                    'body': json.dumps({"message": "Webhook Validation Failure"})
                 }
-        except Exception as e:
-            print(f"ERROR: Error querying DynamoDB for webhook {webhook_url}: {e}")
+            INSTRUMENTATION.debug("Webhook validated successfully", webhook=webhook_log_id(webhook_url))
+            record_webhook_validated(webhook_url, entry, now)
+
+        if not entry.exists:
             return {
-                'statusCode': 500,
+                'statusCode': 200,
                 'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({"message": "Internal server error during database query."})
+                'body': json.dumps({"exists": False})
             }
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({"exists": True, "config": entry.config, "configVersion": entry.config_version})
+        }
     elif path == '/submit-webhook' and http_method == 'POST':
         # Use the entire body as the payload for validation
-        is_valid, error_message = validate_rules_payload(body)
+        is_valid, error_message, rules = validate_rules_payload(body)
         if not is_valid:
             return {
                 'statusCode': 400,
@@ -410,15 +1235,8 @@ def handler(event, context):
             }
             
         webhook_url = body.get('webhookUrl') # Changed to webhookUrl
-        data = {k: v for k, v in body.items() if k != 'webhookUrl'} # Extract data excluding webhookUrl
-
-        # Existing webhook validation (using the new webhookUrl from the payload)
-        if not send_discord_message(webhook_url, "Initializing Splat-Notifyer Webhook..."):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({"message": "Webhook Validation Failure"})
-            }
+        # Only the normalized rules are stored; any other keys in the body are dropped
+        data = {'rules': rules}
 
         current_timestamp = datetime.now(timezone.utc).isoformat()
         # Use a cryptographic hash and truncate to ensure consistent and valid schedule names
@@ -428,88 +1246,89 @@ def handler(event, context):
         hash_digest = hashlib.sha256(webhook_url.encode('utf-8')).hexdigest()
         schedule_name = f"splat-notifyer-{hash_digest[:49]}"
 
-        # Create/Update EventBridge Schedule
+        # Webhook validation and the schedule change are independent, so they run concurrently
+        now = int(time.time())
+        executor = get_submit_executor()
+        validation = executor.submit(send_submit_validation, webhook_url, now)
+        if PER_WEBHOOK_SCHEDULES:
+            schedule_change = executor.submit(upsert_webhook_schedule, schedule_name, webhook_url, data)
+        else:
+            # The batch sweep takes over, so drop any schedule left from a previous submission
+            schedule_change = executor.submit(delete_webhook_schedule, schedule_name)
+
+        validation_result = validation.result()
+        if validation_result is not None and not validation_result.ok and not is_rate_limited(validation_result):
+            # Discord rejected the webhook or could not be reached at this URL; only a rate limit
+            # is no reason to turn the submission away. Undo a schedule that only this submission created
+            try:
+                if schedule_change.result() is True:
+                    delete_webhook_schedule(schedule_name)
+            except Exception as e:
+                INSTRUMENTATION.error("Error creating/updating EventBridge schedule", error=str(e))
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({"message": "Webhook Validation Failure"})
+            }
         try:
-            schedule_description = f"Schedule for webhook {webhook_url}"
-            scheduler_client.create_schedule(
-                FlexibleTimeWindow={'Mode': 'OFF'},
-                Name=schedule_name,
-                GroupName=EVENTBRIDGE_SCHEDULE_GROUP_NAME,
-                Description=schedule_description,
-                ScheduleExpression='cron(10 0/2 * * ? *)',
-                Target={
-                    'Arn': DESTINATION_LAMBDA_ARN,
-                    'RoleArn': EVENTBRIDGE_ROLE_ARN,
-                    'Input': json.dumps({
-                        'webhook_url': webhook_url,
-                        'data': data
-                    })
-                },
-                State='ENABLED',
-                ActionAfterCompletion='NONE'
-            )
-        except scheduler_client.exceptions.ConflictException:
-            # If schedule exists, update it
-            scheduler_client.update_schedule(
-                FlexibleTimeWindow={'Mode': 'OFF'},
-                Name=schedule_name,
-                GroupName=EVENTBRIDGE_SCHEDULE_GROUP_NAME,
-                Description=schedule_description,
-                ScheduleExpression='cron(10 0/2 * * ? *)',
-                Target={
-                    'Arn': DESTINATION_LAMBDA_ARN,
-                    'RoleArn': EVENTBRIDGE_ROLE_ARN,
-                    'Input': json.dumps({
-                        'webhook_url': webhook_url,
-                        'data': data
-                    })
-                },
-                State='ENABLED',
-                ActionAfterCompletion='NONE'
-            )
+            schedule_change.result()
         except Exception as e:
-            print(f"Error creating/updating EventBridge schedule: {e}")
+            INSTRUMENTATION.error("Error creating/updating EventBridge schedule", error=str(e))
             return {
                 'statusCode': 500,
                 'headers': {'Content-Type': 'application/json'},
                 'body': json.dumps({"message": f"Error configuring notification schedule: {e}"})
             }
 
-        # Update DynamoDB
+        # Update DynamoDB. A rate-limited webhook is stored without validated_at and its initializing
+        # message is not retried; its notifications are delivered through the outbox like any other
+        validated_at = now if validation_result is not None and validation_result.ok else None
         try:
-            table.put_item(
-                Item={
-                    'webhook_url': webhook_url,
-                    'schedule': schedule_name,
-                    'updated_at': current_timestamp
-                }
-            )
+            config_version, changed = store_webhook_config(webhook_url, data, schedule_name, current_timestamp, validated_at)
         except Exception as e:
-            print(f"Error updating DynamoDB: {e}")
+            INSTRUMENTATION.error("Error updating DynamoDB", error=str(e))
             return {
                 'statusCode': 500,
                 'headers': {'Content-Type': 'application/json'},
                 'body': json.dumps({"message": "Internal server error during database update."})
             }
-        
-        # Invoke process_notifications
-        try:
-            full_notification_payload = {
-                "webhook_url": webhook_url,
-                "data": data
-            }
-            process_notifications(full_notification_payload, current_timestamp)
-        except Exception as e:
-            print(f"Error invoking process_notifications during submission: {e}")
+        WEBHOOK_CONFIG_CACHE.pop(webhook_url)
+        if validated_at is not None:
+            # Written to the item whether or not the config changed
+            WEBHOOK_VALIDATION_CACHE.put(webhook_url, validated_at)
+
+        # The initial notifications run asynchronously; an unchanged resubmission already had them
+        if changed:
+            try:
+                start_initial_notifications(webhook_url, config_version, context)
+            except Exception as e:
+                INSTRUMENTATION.error("Error starting initial notifications during submission", error=str(e))
 
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({"message": "Webhook submitted and schedule configured successfully.", "schedule_name": schedule_name})
+            'body': json.dumps({"message": "Webhook submitted and schedule configured successfully.", "schedule_name": schedule_name, "configVersion": config_version})
         }
     
+    elif path == '/preview-rules' and http_method == 'POST':
+        # Read-only: shows which upcoming rotations a rule set would announce, without a webhook
+        is_valid, error_message, rules = RULES_SCHEMA.validate_rules(body.get('rules') if isinstance(body, dict) else None)
+        if not is_valid:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({"message": f"Invalid rules: {error_message}"})
+            }
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({"rules": PREVIEW_INDEX.preview(rules, int(time.time()))})
+        }
+
     return {
         'statusCode': 404,
         'headers': {'Content-Type': 'application/json'},
         'body': json.dumps({"message": "Not Found"})
     }
+
+STARTUP_TIMINGS["module_import"] = round((time.perf_counter() - STARTUP_STARTED) * 1000, 2)
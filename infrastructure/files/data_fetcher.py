@@ -1,36 +1,233 @@
 import json
+import hashlib
+import urllib.error
 import urllib.request
 import os
 import boto3
+from botocore.exceptions import ClientError
+from datetime import datetime, timezone
+
+from instrumentation import INSTRUMENTATION
+from schedule_history import S3HistoryStore, archive_started_nodes
+
+# Bump when the snapshot layout changes; api.py falls back to the raw data.json on a mismatch
+SNAPSHOT_FORMAT_VERSION = 1
+
+BANKARA_MATCH_TYPES = {
+    "CHALLENGE": "Series",
+    "OPEN": "Open"
+}
+
+def parse_epoch(timestamp):
+    dt_obj = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if dt_obj.tzinfo is None:
+        dt_obj = dt_obj.replace(tzinfo=timezone.utc)
+    return int(dt_obj.timestamp())
+
+def build_schedule_snapshot(schedules):
+    """Reduces the splatoon3.ink document to the bankara and X nodes the notifier matches against.
+
+    Nodes are [start, end, matchType, vsRule id, [vsStage ids]] with epoch-second times,
+    sorted by start time descending. Names are kept once in the rules/stages lookup tables.
+    """
+    rules = {}
+    stages = {}
+    nodes = []
+
+    def add_node(schedule_node, match_type, setting):
+        try:
+            start = parse_epoch(schedule_node['startTime'])
+            end = parse_epoch(schedule_node['endTime'])
+        except (KeyError, ValueError):
+            return
+        vs_rule = setting.get('vsRule') or {}
+        if not vs_rule.get('id'):
+            return
+        rules[vs_rule['id']] = vs_rule.get('name', vs_rule['id'])
+        stage_ids = []
+        for stage in setting.get('vsStages', []):
+            stages[stage['id']] = stage.get('name', stage['id'])
+            stage_ids.append(stage['id'])
+        nodes.append([start, end, match_type, vs_rule['id'], stage_ids])
+
+    data = schedules.get('data', {})
+    for schedule_node in data.get('bankaraSchedules', {}).get('nodes', []):
+        for setting in schedule_node.get('bankaraMatchSettings') or []:
+            match_type = BANKARA_MATCH_TYPES.get(setting.get('bankaraMode'))
+            if match_type:
+                add_node(schedule_node, match_type, setting)
+
+    for schedule_node in data.get('xSchedules', {}).get('nodes', []):
+        setting = schedule_node.get('xMatchSetting')
+        if setting:
+            add_node(schedule_node, "X-Battle", setting)
+
+    nodes.sort(key=lambda node: node[0], reverse=True)
+    return {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "generatedAt": int(datetime.now(timezone.utc).timestamp()),
+        "rules": rules,
+        "stages": stages,
+        "nodes": nodes
+    }
+
+def node_identity(node):
+    start, end, match_type, vs_rule_id, stage_ids = node
+    return (start, end, match_type, vs_rule_id, tuple(stage_ids))
+
+def diff_snapshots(previous, current, now):
+    """Lists the rotations added to and removed from the schedule between two snapshots.
+
+    Nodes that dropped out only because they ended are not reported as removed.
+    """
+    previous_nodes = {node_identity(node): node for node in (previous or {}).get('nodes', [])}
+    current_nodes = {node_identity(node): node for node in current['nodes']}
+    return {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "generatedAt": current['generatedAt'],
+        "previousGeneratedAt": (previous or {}).get('generatedAt'),
+        "added": [node for key, node in current_nodes.items() if key not in previous_nodes],
+        "removed": [node for key, node in previous_nodes.items() if key not in current_nodes and node[1] > now]
+    }
+
+def read_json_object(s3, bucket, key):
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(response['Body'].read())
+
+def head_metadata(s3, bucket, key):
+    try:
+        return s3.head_object(Bucket=bucket, Key=key).get('Metadata', {})
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404', 'NotFound'):
+            return {}
+        raise
+
+def archive_history(s3, bucket, snapshot):
+    """Appends the rotations that started since the last run to the history archive; never fails the fetch."""
+    if not snapshot:
+        return 0
+    try:
+        with INSTRUMENTATION.timer("history_archive"):
+            archived = archive_started_nodes(S3HistoryStore(s3, bucket), snapshot, int(datetime.now(timezone.utc).timestamp()))
+        INSTRUMENTATION.add("rotations_archived", archived)
+        INSTRUMENTATION.info("Archived started rotations", archived=archived)
+        return archived
+    except Exception as e:
+        INSTRUMENTATION.error("Error archiving schedule history", error=str(e))
+        return 0
 
 def handler(event, context):
+    INSTRUMENTATION.start_invocation(Route="fetch")
+    try:
+        return fetch_schedules()
+    finally:
+        INSTRUMENTATION.flush()
+
+def fetch_schedules():
     schedules_url = "https://splatoon3.ink/data/schedules.json"
     user_agent = "splat-notifyer data cache job"
     s3_bucket_name = os.environ.get("S3_BUCKET_NAME")
     s3_key = "data.json"
+    snapshot_key = os.environ.get("SNAPSHOT_FILE_KEY", "snapshot.json")
+    diff_key = os.environ.get("DIFF_FILE_KEY", "diff.json")
 
     if not s3_bucket_name:
-        print("S3_BUCKET_NAME environment variable not set.")
+        INSTRUMENTATION.error("S3_BUCKET_NAME environment variable not set.")
         return {
             'statusCode': 500,
             'body': json.dumps('S3_BUCKET_NAME not set.')
         }
 
     try:
-        req = urllib.request.Request(schedules_url, headers={'User-Agent': user_agent})
-        with urllib.request.urlopen(req) as response:
-            schedules_data = response.read().decode('utf-8')
+        s3 = INSTRUMENTATION.instrument_client(boto3.client('s3'), "s3")
+        # Upstream validators and the content hash of the last upload are kept as metadata on data.json
+        previous_metadata = head_metadata(s3, s3_bucket_name, s3_key)
+
+        headers = {'User-Agent': user_agent}
+        if previous_metadata.get('upstream-etag'):
+            headers['If-None-Match'] = previous_metadata['upstream-etag']
+        if previous_metadata.get('upstream-last-modified'):
+            headers['If-Modified-Since'] = previous_metadata['upstream-last-modified']
+
+        req = urllib.request.Request(schedules_url, headers=headers)
+        try:
+            with INSTRUMENTATION.timer("upstream_fetch"), urllib.request.urlopen(req) as response:
+                schedules_data = response.read()
+                upstream_etag = response.headers.get('ETag')
+                upstream_last_modified = response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            INSTRUMENTATION.add("upstream_not_modified")
+            INSTRUMENTATION.info("Upstream schedules not modified; skipping upload.")
+            archived = archive_history(s3, s3_bucket_name, read_json_object(s3, s3_bucket_name, snapshot_key))
+            return {
+                'statusCode': 200,
+                'body': json.dumps({"changed": False, "reason": "not-modified", "archived": archived})
+            }
+
+        content_hash = hashlib.sha256(schedules_data).hexdigest()
+        if content_hash == previous_metadata.get('sha256'):
+            INSTRUMENTATION.add("upstream_unchanged")
+            INSTRUMENTATION.info("Fetched schedules are identical to the stored copy; skipping upload.")
+            archived = archive_history(s3, s3_bucket_name, read_json_object(s3, s3_bucket_name, snapshot_key))
+            return {
+                'statusCode': 200,
+                'body': json.dumps({"changed": False, "reason": "unchanged", "archived": archived})
+            }
 
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=s3_bucket_name, Key=s3_key, Body=schedules_data, ContentType='application/json')
+        INSTRUMENTATION.add("upstream_bytes", len(schedules_data), "Bytes")
+        with INSTRUMENTATION.timer("snapshot_build"):
+            snapshot = build_schedule_snapshot(json.loads(schedules_data))
+        previous_snapshot = read_json_object(s3, s3_bucket_name, snapshot_key)
+        with INSTRUMENTATION.timer("snapshot_diff"):
+            diff = diff_snapshots(previous_snapshot, snapshot, snapshot['generatedAt'])
 
+        metadata = {'sha256': content_hash}
+        if upstream_etag:
+            metadata['upstream-etag'] = upstream_etag
+        if upstream_last_modified:
+            metadata['upstream-last-modified'] = upstream_last_modified
+
+        s3.put_object(
+            Bucket=s3_bucket_name,
+            Key=snapshot_key,
+            Body=json.dumps(snapshot, separators=(',', ':')),
+            ContentType='application/json'
+        )
+        s3.put_object(
+            Bucket=s3_bucket_name,
+            Key=diff_key,
+            Body=json.dumps(diff, separators=(',', ':')),
+            ContentType='application/json'
+        )
+        # Written last so a failed run is retried instead of being skipped as unchanged
+        s3.put_object(Bucket=s3_bucket_name, Key=s3_key, Body=schedules_data, ContentType='application/json', Metadata=metadata)
+
+        INSTRUMENTATION.add("upstream_changed")
+        INSTRUMENTATION.add("rotations_added", len(diff['added']))
+        INSTRUMENTATION.add("rotations_removed", len(diff['removed']))
+        INSTRUMENTATION.info("Uploaded changed schedules", added=len(diff['added']), removed=len(diff['removed']))
+        archived = archive_history(s3, s3_bucket_name, snapshot)
         return {
             'statusCode': 200,
-            'body': json.dumps(f'Successfully fetched schedules and uploaded to s3://{s3_bucket_name}/{s3_key}')
+            'body': json.dumps({
+                "changed": True,
+                "added": len(diff['added']),
+                "removed": len(diff['removed']),
+                "archived": archived,
+                "message": f'Successfully fetched schedules and uploaded to s3://{s3_bucket_name}/{s3_key}, {snapshot_key} and {diff_key}'
+            })
         }
     except Exception as e:
-        print(f"Error fetching or uploading data: {e}")
+        INSTRUMENTATION.add("fetch_error")
+        INSTRUMENTATION.error("Error fetching or uploading data", error=str(e))
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error: {str(e)}')
-        }
\ No newline at end of file
+        }
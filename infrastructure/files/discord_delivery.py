@@ -0,0 +1,220 @@
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import INSTRUMENTATION
+
+# retryable is False when sending the same payload again cannot succeed, e.g. a deleted webhook
+DeliveryResult = namedtuple("DeliveryResult", ["ok", "status", "attempts", "retry_after", "error", "retryable"])
+
+RATE_LIMITED_ERROR = "Rate limited"
+
+def is_rate_limited(result):
+    """Whether a failed delivery only failed because Discord rate-limited it, so the webhook itself is reachable."""
+    return not result.ok and (result.status == 429 or result.error == RATE_LIMITED_ERROR)
+
+# Errors raised when a pooled keep-alive connection was closed by the server while idle
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+def header_float(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class RateLimitTracker:
+    """Tracks Discord's X-RateLimit-* headers per webhook and the global limit.
+
+    Senders ask for a delay before every request, so an exhausted bucket is waited out
+    up front instead of being discovered through a 429.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {} # webhook route -> {"bucket", "remaining", "reset_at"}
+        self._global_reset_at = 0.0
+
+    def acquire(self, route):
+        """Reserves a request on route, or returns the seconds to wait before trying again."""
+        now = time.monotonic()
+        with self._lock:
+            if self._global_reset_at > now:
+                return self._global_reset_at - now
+            state = self._routes.get(route)
+            if state is None or state["reset_at"] <= now:
+                # Unknown or expired bucket: let the request through and learn from its headers
+                self._routes.pop(route, None)
+                return 0.0
+            if state["remaining"] <= 0:
+                return state["reset_at"] - now
+            state["remaining"] -= 1
+            return 0.0
+
+    def update(self, route, status, headers, body):
+        """Records the rate limit headers of a response; returns the retry delay for a 429, else None."""
+        now = time.monotonic()
+        with self._lock:
+            remaining = header_float(headers, "X-RateLimit-Remaining")
+            reset_after = header_float(headers, "X-RateLimit-Reset-After")
+            if remaining is not None and reset_after is not None:
+                self._routes[route] = {
+                    "bucket": headers.get("X-RateLimit-Bucket"),
+                    "remaining": int(remaining),
+                    "reset_at": now + reset_after
+                }
+
+            if status != 429:
+                return None
+
+            try:
+                details = json.loads(body or b"{}")
+            except ValueError:
+                details = {}
+            retry_after = details.get("retry_after") or header_float(headers, "Retry-After") or reset_after or 1.0
+            is_global = details.get("global") or headers.get("X-RateLimit-Global", "").lower() == "true"
+            if is_global:
+                self._global_reset_at = max(self._global_reset_at, now + retry_after)
+            else:
+                state = self._routes.setdefault(route, {"bucket": headers.get("X-RateLimit-Bucket")})
+                state["remaining"] = 0
+                state["reset_at"] = now + retry_after
+            return retry_after
+
+class DiscordDeliveryEngine:
+    """Sends webhook payloads over pooled keep-alive connections with per-webhook rate limiting.
+
+    Messages for the same webhook are sent in order on one worker; different webhooks are
+    sent concurrently, so waiting out one webhook's bucket never blocks the others.
+    """
+
+    def __init__(self, max_workers=16, max_attempts=5, timeout=10, user_agent="python-requests/2.32.3"):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.rate_limits = RateLimitTracker()
+        self._local = threading.local()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def send(self, webhook_url, payload, max_wait=None):
+        """Delivers one payload. When max_wait is set, gives up instead of waiting longer than it for a bucket.
+
+        The discord_send timer covers every attempt, including time spent waiting out rate limits.
+        """
+        with INSTRUMENTATION.timer("discord_send"):
+            result = self._send(webhook_url, payload, max_wait)
+        INSTRUMENTATION.add("discord_attempts", result.attempts)
+        INSTRUMENTATION.add("discord_delivered" if result.ok else "discord_failed")
+        return result
+
+    def _send(self, webhook_url, payload, max_wait):
+        parsed = urllib.parse.urlsplit(webhook_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return DeliveryResult(False, None, 0, None, "Unsupported webhook URL", False)
+
+        route = parsed.path
+        path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+        body = json.dumps(payload).encode('utf-8')
+        status = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self.rate_limits.acquire(route)
+            while delay > 0:
+                if max_wait is not None and delay > max_wait:
+                    return DeliveryResult(False, status, attempt - 1, delay, RATE_LIMITED_ERROR, True)
+                INSTRUMENTATION.add("discord_rate_limit_wait_ms", delay * 1000, "Milliseconds")
+                time.sleep(delay)
+                delay = self.rate_limits.acquire(route)
+
+            try:
+                status, headers, response_body = self._post(parsed, path, body)
+            except (OSError, http.client.HTTPException) as e:
+                INSTRUMENTATION.warning("Connection error sending message to Discord", attempt=attempt, error=str(e))
+                return DeliveryResult(False, None, attempt, None, str(e), True)
+
+            retry_after = self.rate_limits.update(route, status, headers, response_body)
+            if 200 <= status < 300:
+                INSTRUMENTATION.debug("Sent Discord message", attempts=attempt)
+                return DeliveryResult(True, status, attempt, None, None, False)
+            if status == 429:
+                INSTRUMENTATION.add("discord_429")
+                INSTRUMENTATION.info("Rate limited by Discord (429)", attempt=attempt, retry_after=retry_after)
+                continue
+            INSTRUMENTATION.warning("HTTP error sending message to Discord", attempt=attempt, status=status)
+            return DeliveryResult(False, status, attempt, None, f"HTTP {status}", status >= 500)
+
+        INSTRUMENTATION.warning("Failed to send Discord message", attempts=self.max_attempts)
+        return DeliveryResult(False, status, self.max_attempts, None, "Too many attempts", True)
+
+    def send_many(self, deliveries, max_wait=None):
+        """Sends (webhook_url, payload) pairs concurrently and returns their DeliveryResults in input order."""
+        deliveries = list(deliveries)
+        by_webhook = {}
+        for index, (webhook_url, payload) in enumerate(deliveries):
+            by_webhook.setdefault(webhook_url, []).append((index, payload))
+
+        results = [None] * len(deliveries)
+
+        def send_all(webhook_url, indexed_payloads):
+            for index, payload in indexed_payloads:
+                results[index] = self.send(webhook_url, payload, max_wait)
+
+        if len(by_webhook) <= 1:
+            for webhook_url, indexed_payloads in by_webhook.items():
+                send_all(webhook_url, indexed_payloads)
+            return results
+
+        futures = [self._get_executor().submit(send_all, webhook_url, indexed_payloads) for webhook_url, indexed_payloads in by_webhook.items()]
+        for future in futures:
+            future.result()
+        return results
+
+    def _get_executor(self):
+        # Kept for the life of the container so worker threads keep their pooled connections
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="discord")
+            return self._executor
+
+    def _post(self, parsed, path, body):
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": self.user_agent
+        }
+        for reuse in (True, False):
+            connection = self._get_connection(parsed, fresh=not reuse)
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                # The body has to be drained before the connection can be reused
+                response_body = response.read()
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reuse:
+                    raise
+                continue
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            return response.status, response.headers, response_body
+
+    def _get_connection(self, parsed, fresh=False):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (parsed.scheme, parsed.netloc)
+        connection = connections.get(key)
+        if connection is None or fresh:
+            if connection is not None:
+                connection.close()
+            connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+            connection = connection_class(parsed.hostname, parsed.port, timeout=self.timeout)
+            connections[key] = connection
+        return connection
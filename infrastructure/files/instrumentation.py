@@ -0,0 +1,112 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Fraction of invocations that log at DEBUG regardless of LOG_LEVEL
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0"))
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "SplatNotifyer")
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+class Instrumentation:
+    """Per-invocation phase timers and counters, emitted as one CloudWatch EMF line, plus leveled JSON logs.
+
+    Timers and counters accumulate across threads until flush(), so a phase that runs many
+    times per invocation (a Discord send, a DynamoDB call) reports its total time and count.
+    """
+
+    def __init__(self, namespace=METRICS_NAMESPACE, level=LOG_LEVEL, debug_sample_rate=LOG_DEBUG_SAMPLE_RATE):
+        self.namespace = namespace
+        self.level = LEVELS.get(level, LEVELS["INFO"])
+        self.debug_sample_rate = debug_sample_rate
+        self._lock = threading.Lock()
+        self._metrics = {} # name -> [value, unit]
+        self._dimensions = {}
+        self._sampled = False
+
+    def start_invocation(self, **dimensions):
+        """Drops metrics left from an earlier invocation and decides whether this one is sampled for DEBUG logs."""
+        with self._lock:
+            self._metrics = {}
+            self._dimensions = dimensions
+            self._sampled = random.random() < self.debug_sample_rate
+
+    def add(self, name, value=1, unit="Count"):
+        with self._lock:
+            metric = self._metrics.setdefault(name, [0, unit])
+            metric[0] += value
+
+    @contextmanager
+    def timer(self, name):
+        """Adds the elapsed milliseconds to name and counts the call in name + "_count"."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}_ms", (time.perf_counter() - started) * 1000, "Milliseconds")
+            self.add(f"{name}_count")
+
+    def flush(self):
+        """Prints the accumulated metrics as an EMF record and resets them."""
+        with self._lock:
+            metrics, self._metrics = self._metrics, {}
+            dimensions = self._dimensions
+        if not metrics:
+            return
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [sorted(dimensions)],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, (_value, unit) in sorted(metrics.items())]
+                }]
+            }
+        }
+        record.update(dimensions)
+        record.update({name: round(value, 3) for name, (value, _unit) in metrics.items()})
+        print(json.dumps(record))
+
+    def enabled(self, level):
+        return LEVELS[level] >= self.level or (level == "DEBUG" and self._sampled)
+
+    def log(self, level, message, **fields):
+        if not self.enabled(level):
+            return
+        print(json.dumps(dict({"level": level, "message": message}, **fields), default=str))
+
+    def debug(self, message, **fields):
+        self.log("DEBUG", message, **fields)
+
+    def info(self, message, **fields):
+        self.log("INFO", message, **fields)
+
+    def warning(self, message, **fields):
+        self.log("WARNING", message, **fields)
+
+    def error(self, message, **fields):
+        self.log("ERROR", message, **fields)
+
+    def instrument_client(self, client, service):
+        """Times every API call a boto3 client makes, retries included, as <service>_ms / <service>_count."""
+        def before_call(context, **kwargs):
+            context["instrumentation_started"] = time.perf_counter()
+
+        def after_call(context, **kwargs):
+            started = context.pop("instrumentation_started", None)
+            if started is not None:
+                self.add(f"{service}_ms", (time.perf_counter() - started) * 1000, "Milliseconds")
+                self.add(f"{service}_count")
+
+        events = client.meta.events
+        # First, so handlers that answer a call themselves (such as botocore's Stubber) are timed too
+        events.register_first("before-call.*.*", before_call)
+        events.register("after-call.*.*", after_call)
+        events.register("after-call-error.*.*", after_call)
+        return client
+
+INSTRUMENTATION = Instrumentation()
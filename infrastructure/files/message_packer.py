@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+# Discord's limits for one webhook message
+CONTENT_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBEDS_PER_MESSAGE = 10
+EMBED_TOTAL_LIMIT = 6000
+
+SECTION_SEPARATOR = "\n\n"
+
+# A webhook payload and the start times of every node announced in it
+PackedMessage = namedtuple("PackedMessage", ["payload", "node_starts"])
+
+def split_section(content, limit):
+    """Splits a rendered section into chunks of at most limit characters, on line boundaries where possible."""
+    if len(content) <= limit:
+        return [content]
+    chunks = []
+    current = ""
+    for line in content.split("\n"):
+        while len(line) > limit:
+            # Only a single line longer than the limit is cut mid-line
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+def pack_content(sections, limit=CONTENT_LIMIT):
+    """Packs sections, in order, into as few plain content messages as fit the content limit.
+
+    sections are Notifications, or anything else with content and node_starts.
+    """
+    messages = []
+    parts, node_starts, last_section = [], [], None
+    for index, section in enumerate(sections):
+        for chunk in split_section(section.content, limit):
+            if parts and len(SECTION_SEPARATOR.join(parts)) + len(SECTION_SEPARATOR) + len(chunk) > limit:
+                messages.append(PackedMessage({"content": SECTION_SEPARATOR.join(parts)}, node_starts))
+                parts, node_starts, last_section = [], [], None
+            if index != last_section:
+                node_starts = node_starts + list(section.node_starts)
+                last_section = index
+            parts.append(chunk)
+    if parts:
+        messages.append(PackedMessage({"content": SECTION_SEPARATOR.join(parts)}, node_starts))
+    return messages
+
+def pack_embeds(sections):
+    """Packs sections into messages of up to ten embeds, one embed per section (or per chunk of a long one).
+
+    Mentions inside embeds do not ping anyone, so this is only suitable for messages that do not rely on them.
+    """
+    messages = []
+    embeds, node_starts, last_section = [], [], None
+    for index, section in enumerate(sections):
+        for chunk in split_section(section.content, EMBED_DESCRIPTION_LIMIT):
+            size = sum(len(embed["description"]) for embed in embeds)
+            if embeds and (len(embeds) == EMBEDS_PER_MESSAGE or size + len(chunk) > EMBED_TOTAL_LIMIT):
+                messages.append(PackedMessage({"embeds": embeds}, node_starts))
+                embeds, node_starts, last_section = [], [], None
+            if index != last_section:
+                node_starts = node_starts + list(section.node_starts)
+                last_section = index
+            embeds.append({"description": chunk})
+    if embeds:
+        messages.append(PackedMessage({"embeds": embeds}, node_starts))
+    return messages
+
+def pack_sections(sections, use_embeds=False):
+    return pack_embeds(sections) if use_embeds else pack_content(sections)
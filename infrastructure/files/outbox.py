@@ -0,0 +1,230 @@
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from instrumentation import INSTRUMENTATION
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+def make_dedup_key(webhook_url, payload, node_starts):
+    """Identifies a delivery by webhook, rendered payload and the start times of the nodes it announces."""
+    digest = hashlib.sha256()
+    digest.update(webhook_url.encode('utf-8'))
+    digest.update(b"\0")
+    digest.update(json.dumps(payload, sort_keys=True).encode('utf-8'))
+    digest.update(b"\0")
+    digest.update(",".join(str(start) for start in node_starts).encode('utf-8'))
+    return digest.hexdigest()
+
+class SQLiteOutboxBackend:
+    """Local outbox storage for tests and offline runs. Use ":memory:" for a throwaway queue."""
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                dedup_key TEXT PRIMARY KEY,
+                webhook_url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt_at INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                last_error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+
+    def put_if_absent(self, entry):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (dedup_key, webhook_url, payload, status, attempts, next_attempt_at, created_at, updated_at, last_error) "
+                "VALUES (:dedup_key, :webhook_url, :payload, :status, :attempts, :next_attempt_at, :created_at, :updated_at, :last_error)",
+                entry
+            )
+            return cursor.rowcount == 1
+
+    def due(self, now, limit, webhook_url=None):
+        query = "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ?"
+        params = [OUTBOX_PENDING, now]
+        if webhook_url is not None:
+            query += " AND webhook_url = ?"
+            params.append(webhook_url)
+        query += " ORDER BY next_attempt_at LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def claim(self, entry, lease_until):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE dedup_key = ? AND status = ? AND next_attempt_at = ?",
+                (lease_until, entry['dedup_key'], OUTBOX_PENDING, entry['next_attempt_at'])
+            )
+            return cursor.rowcount == 1
+
+    def update(self, dedup_key, fields):
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE outbox SET {assignments} WHERE dedup_key = :dedup_key", dict(fields, dedup_key=dedup_key))
+
+    def get(self, dedup_key):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM outbox WHERE dedup_key = ?", (dedup_key,)).fetchone()
+        return dict(row) if row else None
+
+class DynamoDBOutboxBackend:
+    """Outbox storage in a DynamoDB table keyed by dedup_key with a (status, next_attempt_at) index."""
+
+    def __init__(self, table, index_name="status-next_attempt_at-index", retention_seconds=7 * 24 * 3600):
+        self.table = table
+        self.index_name = index_name
+        self.retention_seconds = retention_seconds
+
+    def put_if_absent(self, entry):
+        item = dict(entry, expires_at=entry['created_at'] + self.retention_seconds)
+        if item['last_error'] is None:
+            del item['last_error']
+        try:
+            self.table.put_item(Item=item, ConditionExpression=Attr('dedup_key').not_exists())
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def due(self, now, limit, webhook_url=None):
+        query_kwargs = {
+            'IndexName': self.index_name,
+            'KeyConditionExpression': Key('status').eq(OUTBOX_PENDING) & Key('next_attempt_at').lte(now),
+            'Limit': limit
+        }
+        if webhook_url is not None:
+            query_kwargs['FilterExpression'] = Attr('webhook_url').eq(webhook_url)
+        # Limit caps the items read before the filter, so a page can hold no entries for the
+        # webhook while later pages do; keep paging until enough are collected
+        items = []
+        while len(items) < limit:
+            response = self.table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        items = items[:limit]
+        # The resource layer returns numbers as Decimal
+        for item in items:
+            for name in ('attempts', 'next_attempt_at', 'created_at', 'updated_at'):
+                item[name] = int(item[name])
+        return items
+
+    def claim(self, entry, lease_until):
+        try:
+            self.table.update_item(
+                Key={'dedup_key': entry['dedup_key']},
+                UpdateExpression="SET next_attempt_at = :lease_until",
+                ConditionExpression="#status = :pending AND next_attempt_at = :seen",
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':lease_until': lease_until, ':pending': OUTBOX_PENDING, ':seen': entry['next_attempt_at']}
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def update(self, dedup_key, fields):
+        names = {f"#{name}": name for name in fields}
+        self.table.update_item(
+            Key={'dedup_key': dedup_key},
+            UpdateExpression="SET " + ", ".join(f"#{name} = :{name}" for name in fields),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={f":{name}": value for name, value in fields.items()}
+        )
+
+    def get(self, dedup_key):
+        return self.table.get_item(Key={'dedup_key': dedup_key}).get('Item')
+
+class Outbox:
+    """Durable queue between matching and Discord delivery.
+
+    Rendered messages are enqueued once per dedup key. drain() claims due entries with a lease,
+    delivers them, and either records the final status or reschedules them with backoff, so a
+    rate limit never has to be slept through inside the Lambda.
+    """
+
+    def __init__(self, backend, max_attempts=8, base_delay=30, max_delay=3600, lease_seconds=120):
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+
+    def enqueue(self, webhook_url, payload, node_starts):
+        """Queues a payload for delivery; returns False when the same delivery was already queued."""
+        now = int(time.time())
+        return self.backend.put_if_absent({
+            'dedup_key': make_dedup_key(webhook_url, payload, node_starts),
+            'webhook_url': webhook_url,
+            'payload': json.dumps(payload),
+            'status': OUTBOX_PENDING,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+            'updated_at': now,
+            'last_error': None
+        })
+
+    def drain(self, engine, deadline=None, batch_size=100, max_wait=2.0, webhook_url=None):
+        """Delivers due entries until none are left or the epoch-second deadline passes."""
+        with INSTRUMENTATION.timer("outbox_drain"):
+            stats = self._drain(engine, deadline, batch_size, max_wait, webhook_url)
+        for outcome, count in stats.items():
+            INSTRUMENTATION.add(f"outbox_{outcome}", count)
+        return stats
+
+    def _drain(self, engine, deadline, batch_size, max_wait, webhook_url):
+        stats = {"sent": 0, "retried": 0, "failed": 0}
+        while deadline is None or time.time() < deadline:
+            now = int(time.time())
+            claimed = [entry for entry in self.backend.due(now, batch_size, webhook_url)
+                       if self.backend.claim(entry, now + self.lease_seconds)]
+            if not claimed:
+                break
+
+            results = engine.send_many(
+                ((entry['webhook_url'], json.loads(entry['payload'])) for entry in claimed),
+                max_wait=max_wait
+            )
+            for entry, result in zip(claimed, results):
+                stats[self._record(entry, result)] += 1
+        return stats
+
+    def _record(self, entry, result):
+        now = int(time.time())
+        attempts = entry['attempts'] + max(result.attempts, 1)
+        fields = {'attempts': attempts, 'updated_at': now}
+        if result.ok:
+            fields['status'] = OUTBOX_SENT
+            outcome = "sent"
+        elif result.retryable and attempts < self.max_attempts:
+            delay = result.retry_after or min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+            fields['next_attempt_at'] = now + int(math.ceil(delay))
+            fields['last_error'] = result.error
+            outcome = "retried"
+        else:
+            fields['status'] = OUTBOX_FAILED
+            fields['last_error'] = result.error
+            outcome = "failed"
+        self.backend.update(entry['dedup_key'], fields)
+        return outcome
@@ -0,0 +1,168 @@
+import json
+import os
+
+# Catalogs the web app offers; bundled next to this module in the Lambda package
+CATALOG_DIR = os.environ.get("RULES_CATALOG_DIR", os.path.dirname(os.path.abspath(__file__)))
+# Local runs read them from the repository root, where the web app serves them
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+STAGE_CATALOG = "maps.json"
+MODE_CATALOG = "batle-modes.json"
+
+MAX_WEBHOOK_URL_LENGTH = 512
+MAX_RULES = 20
+MAX_MESSAGE_LENGTH = 300
+MATCH_TYPES = frozenset(["X-Battle", "Series", "Open"])
+NOTIFY_TYPES = frozenset(["at-least-one", "two-same-rotation"])
+# Rotations start on every even UTC hour
+TIME_SLOTS = frozenset(f"{hour:02d}:00Z" for hour in range(0, 24, 2))
+
+def load_catalog(name, catalog_dir=None):
+    """Returns the ids of a catalog keyed by id, such as maps.json."""
+    for directory in ([catalog_dir] if catalog_dir else [CATALOG_DIR, REPO_ROOT]):
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            with open(path) as f:
+                return frozenset(json.load(f))
+    raise FileNotFoundError(f"Catalog {name} not found")
+
+def canonicalize_rule(rule):
+    """Rewrites a validated rule into one form per meaning: sorted unique slots and maps, enabled modes only.
+
+    Matching a canonical rule gives the same notifications as matching the rule it came from.
+    """
+    enabled_modes = sorted(mode_id for mode_id, is_enabled in rule['battleModes'].items()
+                           if is_enabled and rule['maps'].get(mode_id))
+    return {
+        "notificationMessage": rule['notificationMessage'],
+        "matchType": rule['matchType'],
+        "timeSlots": sorted(set(rule['timeSlots'])),
+        "battleModes": {mode_id: True for mode_id in enabled_modes},
+        "maps": {
+            mode_id: {
+                "notifyType": rule['maps'][mode_id]['notifyType'],
+                "selectedMaps": sorted(set(rule['maps'][mode_id]['selectedMaps']))
+            }
+            for mode_id in enabled_modes
+        }
+    }
+
+def canonicalize_rules(rules):
+    # Rule order is kept, since it decides the order of messages
+    return [canonicalize_rule(rule) for rule in rules]
+
+class RulesSchema:
+    """Validates /submit-webhook payloads against the stage and mode catalogs and normalizes their rules.
+
+    The id sets and size limits are built once, so a payload is checked in one pass of set
+    lookups that stops at the first error, including any list or dict larger than the
+    catalogs allow, before its rules are rewritten into the canonical form the matcher and
+    the webhooks table use.
+    """
+
+    def __init__(self, stage_ids, mode_ids, max_rules=MAX_RULES):
+        self.stage_ids = frozenset(stage_ids)
+        self.mode_ids = frozenset(mode_ids)
+        self.max_rules = max_rules
+
+    @classmethod
+    def from_catalogs(cls, catalog_dir=None):
+        return cls(load_catalog(STAGE_CATALOG, catalog_dir), load_catalog(MODE_CATALOG, catalog_dir))
+
+    def validate(self, payload):
+        """Returns (is_valid, message, canonical rules); the rules are None when the payload is invalid."""
+        error = self._check_payload(payload)
+        if error:
+            return False, error, None
+        return True, "Payload is valid.", canonicalize_rules(payload["rules"])
+
+    def validate_rules(self, rules):
+        """Like validate(), for a bare list of rules."""
+        error = self._check_rules(rules)
+        if error:
+            return False, error, None
+        return True, "Rules are valid.", canonicalize_rules(rules)
+
+    def _check_payload(self, payload):
+        if not isinstance(payload, dict):
+            return "Payload must be a dictionary."
+
+        webhook_url = payload.get("webhookUrl")
+        rules = payload.get("rules")
+
+        if not isinstance(webhook_url, str) or not webhook_url:
+            return "webhookUrl is required and must be a non-empty string."
+        if len(webhook_url) > MAX_WEBHOOK_URL_LENGTH:
+            return f"webhookUrl cannot exceed {MAX_WEBHOOK_URL_LENGTH} characters."
+
+        return self._check_rules(rules)
+
+    def _check_rules(self, rules):
+        if not isinstance(rules, list):
+            return "rules is required and must be a list."
+        if len(rules) > self.max_rules:
+            return f"rules cannot have more than {self.max_rules} entries."
+
+        for i, rule in enumerate(rules):
+            error = self._check_rule(i, rule)
+            if error:
+                return error
+        return None
+
+    def _check_rule(self, i, rule):
+        if not isinstance(rule, dict):
+            return f"Rule at index {i} must be a dictionary."
+
+        notification_message = rule.get("notificationMessage")
+        if not isinstance(notification_message, str) or not notification_message.strip():
+            return f"notificationMessage in rule {i} is required and must be a non-empty string."
+        if len(notification_message) > MAX_MESSAGE_LENGTH:
+            return f"notificationMessage in rule {i} cannot exceed {MAX_MESSAGE_LENGTH} characters."
+
+        match_type = rule.get("matchType")
+        if not isinstance(match_type, str) or match_type not in MATCH_TYPES:
+            return f"matchType in rule {i} must be 'X-Battle' or 'Open' or 'Series'."
+
+        time_slots = rule.get("timeSlots")
+        if not isinstance(time_slots, list):
+            return f"timeSlots in rule {i} is required and must be a list."
+        if len(time_slots) > len(TIME_SLOTS):
+            return f"timeSlots in rule {i} cannot have more than {len(TIME_SLOTS)} entries."
+        for j, slot in enumerate(time_slots):
+            if not isinstance(slot, str) or slot not in TIME_SLOTS:
+                return f"timeSlots[{j}] in rule {i} is invalid. Expected the UTC start of a rotation, HH:00Z on an even hour."
+
+        battle_modes = rule.get("battleModes")
+        if not isinstance(battle_modes, dict):
+            return f"battleModes in rule {i} is required and must be a dictionary."
+        if len(battle_modes) > len(self.mode_ids):
+            return f"battleModes in rule {i} cannot have more than {len(self.mode_ids)} entries."
+        for mode_id, is_enabled in battle_modes.items():
+            if mode_id not in self.mode_ids:
+                return f"battleModes key '{mode_id}' in rule {i} is not a known battle mode."
+            if not isinstance(is_enabled, bool):
+                return f"battleModes value for '{mode_id}' in rule {i} must be a boolean."
+
+        maps = rule.get("maps")
+        if not isinstance(maps, dict):
+            return f"maps in rule {i} is required and must be a dictionary."
+        if len(maps) > len(self.mode_ids):
+            return f"maps in rule {i} cannot have more than {len(self.mode_ids)} entries."
+        for mode_id, map_details in maps.items():
+            if mode_id not in self.mode_ids:
+                return f"maps key '{mode_id}' in rule {i} is not a known battle mode."
+            if not isinstance(map_details, dict):
+                return f"map details for '{mode_id}' in rule {i} must be a dictionary."
+
+            notify_type = map_details.get("notifyType")
+            if not isinstance(notify_type, str) or notify_type not in NOTIFY_TYPES:
+                return f"notifyType for map '{mode_id}' in rule {i} must be 'at-least-one' or 'two-same-rotation'."
+
+            selected_maps = map_details.get("selectedMaps")
+            if not isinstance(selected_maps, list):
+                return f"selectedMaps for map '{mode_id}' in rule {i} is required and must be a list."
+            if len(selected_maps) > len(self.stage_ids):
+                return f"selectedMaps for map '{mode_id}' in rule {i} cannot have more than {len(self.stage_ids)} entries."
+            for map_id in selected_maps:
+                if not isinstance(map_id, str) or map_id not in self.stage_ids:
+                    return f"selectedMaps for map '{mode_id}' in rule {i} must only contain known stage ids."
+        return None
@@ -0,0 +1,196 @@
+import bisect
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+HISTORY_PREFIX = "history/"
+HISTORY_FORMAT_VERSION = 1
+
+def start_date(start):
+    return datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d")
+
+def start_slot(start):
+    return datetime.fromtimestamp(start, timezone.utc).strftime("%H:%M") + "Z"
+
+def dates_between(start, end):
+    """Lists the UTC dates of every second in [start, end)."""
+    dates = []
+    day = 24 * 3600
+    for midnight in range(start - start % day, end, day):
+        dates.append(start_date(midnight))
+    return dates
+
+class S3HistoryStore:
+    def __init__(self, s3, bucket):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def read(self, key):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return response['Body'].read().decode('utf-8')
+
+    def write(self, key, body, content_type):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body.encode('utf-8'), ContentType=content_type)
+
+class LocalHistoryStore:
+    """Keeps the archive in a local directory, e.g. for tests and offline simulations."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def read(self, key):
+        try:
+            with open(os.path.join(self.directory, key)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, body, content_type):
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(body)
+
+def empty_index(snapshot_version):
+    return {
+        "version": HISTORY_FORMAT_VERSION,
+        "snapshotVersion": snapshot_version,
+        "archivedThrough": 0,
+        "partitions": {},
+        "rules": {},
+        "stages": {}
+    }
+
+def encode_nodes(nodes):
+    return "".join(json.dumps(node, separators=(',', ':')) + "\n" for node in nodes)
+
+def decode_nodes(body):
+    return [json.loads(line) for line in body.splitlines() if line]
+
+def archive_started_nodes(store, snapshot, now, prefix=HISTORY_PREFIX):
+    """Appends the snapshot's rotations that started since the last run to the history archive.
+
+    Only rotations that already started are archived, so the history holds what actually ran.
+    Every run writes new date-partitioned NDJSON objects in the snapshot's node format and never
+    rewrites one; the index listing them is written last. Once a date is over, its objects are
+    merged into a single one so range reads need one request per day. Returns how many rotations
+    were archived.
+    """
+    index_key = f"{prefix}index.json"
+    index_body = store.read(index_key)
+    index = json.loads(index_body) if index_body else empty_index(snapshot['version'])
+    if index['snapshotVersion'] != snapshot['version']:
+        raise ValueError(f"History was archived from snapshot version {index['snapshotVersion']}, not {snapshot['version']}")
+
+    started = sorted((node for node in snapshot['nodes'] if index['archivedThrough'] < node[0] <= now), key=lambda node: node[0])
+    by_date = {}
+    for node in started:
+        by_date.setdefault(start_date(node[0]), []).append(node)
+    for date, nodes in by_date.items():
+        key = f"{prefix}nodes/{date}/{now}.ndjson"
+        store.write(key, encode_nodes(nodes), 'application/x-ndjson')
+        index['partitions'].setdefault(date, []).append(key)
+
+    today = start_date(now)
+    for date, keys in index['partitions'].items():
+        if date < today and len(keys) > 1:
+            nodes = [node for key in keys for node in decode_nodes(store.read(key) or "")]
+            nodes.sort(key=lambda node: node[0])
+            # A late append re-merges the day under a new key, so readers that cache by key never see a stale day
+            key = f"{prefix}nodes/{date}/day-{now}.ndjson"
+            store.write(key, encode_nodes(nodes), 'application/x-ndjson')
+            index['partitions'][date] = [key]
+
+    if started:
+        index['archivedThrough'] = started[-1][0]
+        index['rules'].update(snapshot['rules'])
+        index['stages'].update(snapshot['stages'])
+    store.write(index_key, json.dumps(index, separators=(',', ':')), 'application/json')
+    return len(started)
+
+class HistoryIndex:
+    """Archived rotations sorted by start, with posting lists by match type, rule, stage and slot.
+
+    query() narrows a start time range with a binary search and intersects the posting lists
+    of the other criteria, smallest first. The snapshot's version and name tables are kept so
+    query_snapshot() can hand its results to the same loader as a snapshot.
+    """
+
+    def __init__(self, nodes, version=None, rules=None, stages=None):
+        self.version = version
+        self.rules = rules or {}
+        self.stages = stages or {}
+        self.nodes = sorted(nodes, key=lambda node: node[0])
+        self.starts = [node[0] for node in self.nodes]
+        self.postings = {}
+        for position, (start, _end, match_type, rule_id, stage_ids) in enumerate(self.nodes):
+            keys = {("matchType", match_type), ("rule", rule_id), ("slot", start_slot(start))}
+            keys.update(("stage", stage_id) for stage_id in stage_ids)
+            for key in keys:
+                self.postings.setdefault(key, []).append(position)
+
+    def query(self, start=None, end=None, match_type=None, rule_id=None, stage_id=None, slot=None):
+        """Returns the rotations starting in [start, end) that match every given criterion, oldest first."""
+        low = 0 if start is None else bisect.bisect_left(self.starts, start)
+        high = len(self.starts) if end is None else bisect.bisect_left(self.starts, end)
+        criteria = [key for key in (("matchType", match_type), ("rule", rule_id), ("stage", stage_id), ("slot", slot)) if key[1] is not None]
+        if not criteria:
+            return self.nodes[low:high]
+        postings = sorted((self.postings.get(key, []) for key in criteria), key=len)
+        positions = set(postings[0][bisect.bisect_left(postings[0], low):bisect.bisect_left(postings[0], high)])
+        for posting in postings[1:]:
+            positions.intersection_update(posting)
+        return [self.nodes[position] for position in sorted(positions)]
+
+    def query_snapshot(self, **criteria):
+        """Like query(), as a snapshot sorted by start descending."""
+        nodes = self.query(**criteria)
+        nodes.reverse()
+        return {"version": self.version, "rules": self.rules, "stages": self.stages, "nodes": nodes}
+
+class ScheduleHistory:
+    """Reads windows of the history archive written by archive_started_nodes.
+
+    Archived objects are never rewritten, so they are cached by key for the life of the container.
+    """
+
+    def __init__(self, store, prefix=HISTORY_PREFIX, max_workers=8):
+        self.store = store
+        self.prefix = prefix
+        self.max_workers = max_workers
+        self._objects = {}
+
+    def read_index(self):
+        body = self.store.read(f"{self.prefix}index.json")
+        return json.loads(body) if body else None
+
+    def _read_nodes(self, key):
+        nodes = self._objects.get(key)
+        if nodes is None:
+            nodes = self._objects[key] = decode_nodes(self.store.read(key) or "")
+        return nodes
+
+    def load(self, start, end):
+        """Returns the rotations that started in [start, end) as a snapshot, sorted by start descending."""
+        index = self.read_index()
+        if index is None:
+            return {"version": None, "rules": {}, "stages": {}, "nodes": []}
+        keys = [key for date in dates_between(start, end) for key in index['partitions'].get(date, [])]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            partitions = list(executor.map(self._read_nodes, keys))
+        nodes = [node for partition in partitions for node in partition if start <= node[0] < end]
+        nodes.sort(key=lambda node: node[0], reverse=True)
+        return {"version": index['snapshotVersion'], "rules": index['rules'], "stages": index['stages'], "nodes": nodes}
+
+    def index(self, start, end):
+        """Returns a HistoryIndex over the rotations that started in [start, end)."""
+        snapshot = self.load(start, end)
+        return HistoryIndex(snapshot['nodes'], snapshot['version'], snapshot['rules'], snapshot['stages'])
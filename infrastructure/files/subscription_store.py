@@ -0,0 +1,133 @@
+from functools import reduce
+from operator import or_
+
+class Vocabulary:
+    """Assigns consecutive bit positions to the values of a small domain as they are first seen."""
+
+    def __init__(self):
+        self.bits = {}
+        self.flags = {} # value -> 1 << bit
+
+    def bit(self, value):
+        bit = self.bits.get(value)
+        if bit is None:
+            bit = self.bits[value] = len(self.bits)
+            self.flags[value] = 1 << bit
+        return bit
+
+    def mask(self, values):
+        try:
+            return reduce(or_, map(self.flags.__getitem__, values), 0)
+        except KeyError:
+            for value in values:
+                self.bit(value)
+            return reduce(or_, map(self.flags.__getitem__, values), 0)
+
+class SubscriptionStore:
+    """Columnar encoding of canonical subscriber rules for matching a whole population at once.
+
+    Every enabled mode of a rule becomes one row holding its match type and mode codes, a time
+    slot bitmask, a stage bitmask, the notifyType flag and the rule's watermark. Rows are bucketed
+    by (match type, mode), so a schedule node is only compared against its own bucket, and a row
+    is tested with a couple of integer AND operations.
+    """
+
+    def __init__(self):
+        self.match_types = Vocabulary()
+        self.modes = Vocabulary()
+        self.slots = Vocabulary()
+        self.stages = Vocabulary()
+        self.subscriber_count = 0
+        # One entry per row, in (subscriber, rule) order
+        self._subscribers = []
+        self._messages = []
+        self._buckets = {} # (match type bit, mode bit) -> row ids
+        self._slot_masks = []
+        self._stage_masks = []
+        self._two_same = []
+        self._watermarks = []
+
+    def add(self, rules, watermarks=None, watermark_key=None):
+        """Adds one subscriber's canonical rules and returns its subscriber index.
+
+        watermark_key maps a rule to its key in watermarks, as in incremental mode.
+        """
+        rows = []
+        for rule in rules:
+            watermark = watermarks.get(watermark_key(rule), 0) if watermarks else 0
+            slot_mask = self.slots.mask(rule['timeSlots'])
+            match_type_bit = self.match_types.bit(rule['matchType'])
+            for mode_id, is_enabled in rule['battleModes'].items():
+                map_details = rule['maps'].get(mode_id)
+                if not is_enabled or not map_details:
+                    continue
+                rows.append((
+                    (match_type_bit, self.modes.bit(mode_id)),
+                    rule['notificationMessage'],
+                    slot_mask,
+                    self.stages.mask(map_details['selectedMaps']),
+                    map_details['notifyType'] == "two-same-rotation",
+                    watermark
+                ))
+
+        subscriber = self.subscriber_count
+        self.subscriber_count += 1
+        for bucket, message, slot_mask, stage_mask, two_same, watermark in rows:
+            self._buckets.setdefault(bucket, []).append(len(self._subscribers))
+            self._subscribers.append(subscriber)
+            self._messages.append(message)
+            self._slot_masks.append(slot_mask)
+            self._stage_masks.append(stage_mask)
+            self._two_same.append(two_same)
+            self._watermarks.append(watermark)
+        return subscriber
+
+    def match(self, nodes):
+        """Returns, per subscriber, a dict of notification message -> matched nodes.
+
+        The dicts are filled in the order build_notifications uses: nodes as given, then rules
+        in submission order, so rendering them produces identical messages.
+        """
+        matches = [{} for _ in range(self.subscriber_count)]
+        for node in nodes:
+            for row in self._match_node(node):
+                matches[self._subscribers[row]].setdefault(self._messages[row], []).append(node)
+        return matches
+
+    def _encode_node(self, node):
+        match_type_bit = self.match_types.bits.get(node.match_type)
+        mode_bit = self.modes.bits.get(node.rule_id)
+        slot_bit = self.slots.bits.get(node.slot)
+        if match_type_bit is None or mode_bit is None or slot_bit is None:
+            return None
+        stage_mask = 0
+        # A stage no rule selected can never be part of a two-same-rotation match
+        all_stages_known = len(node.stage_ids) == 2
+        for stage_id in node.stage_ids:
+            stage_bit = self.stages.bits.get(stage_id)
+            if stage_bit is None:
+                all_stages_known = False
+            else:
+                stage_mask |= 1 << stage_bit
+        return (match_type_bit, mode_bit), slot_bit, stage_mask, all_stages_known
+
+    def _match_node(self, node):
+        encoded = self._encode_node(node)
+        if encoded is None:
+            return []
+        bucket, slot_bit, stage_mask, two_same_possible = encoded
+        if bucket not in self._buckets:
+            return []
+
+        rows = []
+        slot_flag = 1 << slot_bit
+        for row in self._buckets[bucket]:
+            if not self._slot_masks[row] & slot_flag or node.start <= self._watermarks[row]:
+                continue
+            overlap = self._stage_masks[row] & stage_mask
+            if self._two_same[row]:
+                if two_same_possible and overlap == stage_mask:
+                    rows.append(row)
+            elif overlap:
+                rows.append(row)
+        return rows
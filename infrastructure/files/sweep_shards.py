@@ -0,0 +1,235 @@
+import json
+import sqlite3
+import threading
+import time
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+SHARD_PENDING = "pending"
+SHARD_LEASED = "leased"
+SHARD_DONE = "done"
+SHARD_FAILED = "failed"
+
+def is_claimable(record, now):
+    return record['status'] == SHARD_PENDING or (record['status'] == SHARD_LEASED and record['lease_until'] <= now)
+
+class SQLiteLeaseBackend:
+    """Local shard lease storage. Use a file path to share leases between worker processes."""
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS shard_leases (
+                sweep_id TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                shard_count INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_until INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                stats TEXT,
+                last_error TEXT,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (sweep_id, shard)
+            )
+        """)
+
+    def put_if_absent(self, record):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO shard_leases (sweep_id, shard, shard_count, timestamp, status, owner, lease_until, attempts, stats, last_error, updated_at) "
+                "VALUES (:sweep_id, :shard, :shard_count, :timestamp, :status, :owner, :lease_until, :attempts, :stats, :last_error, :updated_at)",
+                record
+            )
+            return cursor.rowcount == 1
+
+    def list(self, sweep_id):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM shard_leases WHERE sweep_id = ? ORDER BY shard", (sweep_id,))]
+
+    def claim(self, record, owner, now, lease_until):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE shard_leases SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE sweep_id = ? AND shard = ? AND attempts = ? AND (status = ? OR (status = ? AND lease_until <= ?))",
+                (SHARD_LEASED, owner, lease_until, now, record['sweep_id'], record['shard'], record['attempts'], SHARD_PENDING, SHARD_LEASED, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, record, owner, fields):
+        """Applies fields to a shard this owner still holds; returns False when its lease was lost."""
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE shard_leases SET {assignments} WHERE sweep_id = :sweep_id AND shard = :shard AND owner = :owner AND status = :leased",
+                dict(fields, sweep_id=record['sweep_id'], shard=record['shard'], owner=owner, leased=SHARD_LEASED)
+            )
+            return cursor.rowcount == 1
+
+class DynamoDBLeaseBackend:
+    """Shard lease storage in a DynamoDB table keyed by sweep_id (hash) and shard (range)."""
+
+    def __init__(self, table, retention_seconds=2 * 24 * 3600):
+        self.table = table
+        self.retention_seconds = retention_seconds
+
+    def put_if_absent(self, record):
+        item = {name: value for name, value in record.items() if value is not None}
+        item['expires_at'] = record['updated_at'] + self.retention_seconds
+        try:
+            self.table.put_item(Item=item, ConditionExpression="attribute_not_exists(sweep_id)")
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def list(self, sweep_id):
+        records = []
+        query_kwargs = {'KeyConditionExpression': Key('sweep_id').eq(sweep_id), 'ConsistentRead': True}
+        while True:
+            response = self.table.query(**query_kwargs)
+            for item in response.get('Items', []):
+                # The resource layer returns numbers as Decimal
+                for name in ('shard', 'shard_count', 'lease_until', 'attempts', 'updated_at'):
+                    item[name] = int(item[name])
+                item.setdefault('owner', None)
+                item.setdefault('stats', None)
+                item.setdefault('last_error', None)
+                records.append(item)
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return records
+            query_kwargs['ExclusiveStartKey'] = last_key
+
+    def claim(self, record, owner, now, lease_until):
+        try:
+            self.table.update_item(
+                Key={'sweep_id': record['sweep_id'], 'shard': record['shard']},
+                UpdateExpression="SET #status = :leased, #owner = :owner, lease_until = :lease_until, updated_at = :now ADD attempts :one",
+                ConditionExpression="attempts = :seen AND (#status = :pending OR (#status = :leased AND lease_until <= :now))",
+                ExpressionAttributeNames={'#status': 'status', '#owner': 'owner'},
+                ExpressionAttributeValues={
+                    ':leased': SHARD_LEASED, ':pending': SHARD_PENDING, ':owner': owner, ':lease_until': lease_until,
+                    ':now': now, ':one': 1, ':seen': record['attempts']
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def release(self, record, owner, fields):
+        names = {f"#{name}": name for name in fields}
+        names.update({'#owner': 'owner', '#status': 'status'})
+        values = {f":{name}": value for name, value in fields.items()}
+        values.update({':holder': owner, ':leased': SHARD_LEASED})
+        try:
+            self.table.update_item(
+                Key={'sweep_id': record['sweep_id'], 'shard': record['shard']},
+                UpdateExpression="SET " + ", ".join(f"#{name} = :{name}" for name in fields),
+                ConditionExpression="#owner = :holder AND #status = :leased",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+class ShardCoordinator:
+    """Splits a sweep into shards that workers claim through leases.
+
+    start() records every shard of a sweep as pending. Workers claim a pending shard, or one
+    whose lease expired because its worker died, process it, and report its stats back. A
+    shard that raised is released for another attempt until max_attempts is reached.
+    """
+
+    def __init__(self, backend, lease_seconds=900, max_attempts=3):
+        self.backend = backend
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def start(self, sweep_id, shard_count, timestamp):
+        """Records the shards of a sweep; returns how many were new. Starting a sweep twice is harmless."""
+        now = int(time.time())
+        created = 0
+        for shard in range(shard_count):
+            created += self.backend.put_if_absent({
+                'sweep_id': sweep_id,
+                'shard': shard,
+                'shard_count': shard_count,
+                'timestamp': timestamp,
+                'status': SHARD_PENDING,
+                'owner': None,
+                'lease_until': 0,
+                'attempts': 0,
+                'stats': None,
+                'last_error': None,
+                'updated_at': now
+            })
+        return created
+
+    def claimable(self, sweep_id):
+        now = int(time.time())
+        return [record for record in self.backend.list(sweep_id) if is_claimable(record, now)]
+
+    def claim(self, sweep_id, owner):
+        """Leases the next claimable shard to owner and returns its record, or None when none is left."""
+        now = int(time.time())
+        for record in self.claimable(sweep_id):
+            if self.backend.claim(record, owner, now, now + self.lease_seconds):
+                return dict(record, attempts=record['attempts'] + 1, owner=owner)
+        return None
+
+    def complete(self, record, stats):
+        return self.backend.release(record, record['owner'], {
+            'status': SHARD_DONE,
+            'stats': json.dumps(stats),
+            'updated_at': int(time.time())
+        })
+
+    def fail(self, record, error):
+        status = SHARD_FAILED if record['attempts'] >= self.max_attempts else SHARD_PENDING
+        return self.backend.release(record, record['owner'], {
+            'status': status,
+            'lease_until': 0,
+            'last_error': error,
+            'updated_at': int(time.time())
+        })
+
+    def run_worker(self, sweep_id, owner, process_shard, deadline=None):
+        """Claims and processes shards until none are left or the epoch-second deadline passes.
+
+        process_shard(shard, shard_count, timestamp) returns the shard's stats.
+        """
+        processed = []
+        while deadline is None or time.time() < deadline:
+            record = self.claim(sweep_id, owner)
+            if record is None:
+                break
+            try:
+                stats = process_shard(record['shard'], record['shard_count'], record['timestamp'])
+            except Exception as e:
+                self.fail(record, str(e))
+                continue
+            self.complete(record, stats)
+            processed.append(record['shard'])
+        return processed
+
+    def progress(self, sweep_id):
+        """Counts a sweep's shards by status and sums the stats reported by finished shards."""
+        progress = {"shards": 0, SHARD_PENDING: 0, SHARD_LEASED: 0, SHARD_DONE: 0, SHARD_FAILED: 0, "stats": {}}
+        for record in self.backend.list(sweep_id):
+            progress["shards"] += 1
+            progress[record['status']] += 1
+            for name, value in json.loads(record['stats'] or "{}").items():
+                if isinstance(value, (int, float)):
+                    progress["stats"][name] = progress["stats"].get(name, 0) + value
+        return progress
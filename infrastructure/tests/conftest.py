@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The Lambda modules import each other as top-level modules, as they do in the deployment package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "files"))
@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from message_packer import (
+    CONTENT_LIMIT, EMBED_DESCRIPTION_LIMIT, EMBED_TOTAL_LIMIT, EMBEDS_PER_MESSAGE, SECTION_SEPARATOR,
+    pack_content, pack_embeds, split_section
+)
+
+Section = namedtuple("Section", ["content", "node_starts"])
+
+def make_section(lines, line_length=60, start=0):
+    content = "\n".join(f"{index:04d}".ljust(line_length, "x") for index in range(lines))
+    return Section(content, [start + index for index in range(lines)])
+
+def content_lines(messages):
+    return [line for message in messages for part in message.payload["content"].split(SECTION_SEPARATOR) for line in part.split("\n")]
+
+def test_small_sections_share_one_message():
+    sections = [Section("first", [1]), Section("second", [2, 3])]
+
+    messages = pack_content(sections)
+
+    assert len(messages) == 1
+    assert messages[0].payload == {"content": "first\n\nsecond"}
+    assert messages[0].node_starts == [1, 2, 3]
+
+def test_content_messages_stay_within_the_limit_and_keep_every_line():
+    sections = [make_section(lines, start=1000 * index) for index, lines in enumerate([5, 40, 3, 90, 1])]
+
+    messages = pack_content(sections)
+
+    assert all(len(message.payload["content"]) <= CONTENT_LIMIT for message in messages)
+    assert content_lines(messages) == [line for section in sections for line in section.content.split("\n")]
+    # Every section's nodes are attributed to a message that carries part of it
+    assert sorted({start for message in messages for start in message.node_starts}) == sorted(
+        start for section in sections for start in section.node_starts
+    )
+
+def test_a_line_longer_than_the_limit_is_cut():
+    chunks = split_section("short\n" + "y" * (CONTENT_LIMIT * 2 + 5), CONTENT_LIMIT)
+
+    assert all(len(chunk) <= CONTENT_LIMIT for chunk in chunks)
+    assert "".join(chunks[1:]) == "y" * (CONTENT_LIMIT * 2 + 5)
+
+def test_embed_messages_stay_within_discord_limits():
+    sections = [make_section(lines, line_length=100, start=1000 * index) for index, lines in enumerate([3] * 12 + [70, 10])]
+
+    messages = pack_embeds(sections)
+
+    for message in messages:
+        embeds = message.payload["embeds"]
+        assert 1 <= len(embeds) <= EMBEDS_PER_MESSAGE
+        assert all(len(embed["description"]) <= EMBED_DESCRIPTION_LIMIT for embed in embeds)
+        assert sum(len(embed["description"]) for embed in embeds) <= EMBED_TOTAL_LIMIT
+    descriptions = [embed["description"] for message in messages for embed in message.payload["embeds"]]
+    assert "\n".join(descriptions).split("\n") == [line for section in sections for line in section.content.split("\n")]
+
+def test_nothing_to_pack():
+    assert pack_content([]) == []
+    assert pack_embeds([]) == []
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from discord_delivery import DeliveryResult
+from outbox import OUTBOX_FAILED, OUTBOX_PENDING, OUTBOX_SENT, Outbox, SQLiteOutboxBackend, make_dedup_key
+
+WEBHOOK = "https://discord.com/api/webhooks/1/token"
+OTHER_WEBHOOK = "https://discord.com/api/webhooks/2/token"
+
+class RecordingEngine:
+    """Answers every send with the next scripted result and records what was sent."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.sent = []
+
+    def send_many(self, deliveries, max_wait=None):
+        results = []
+        for webhook_url, payload in deliveries:
+            self.sent.append((webhook_url, payload))
+            results.append(self.results.pop(0) if self.results else DeliveryResult(True, 204, 1, None, None, False))
+        return results
+
+@pytest.fixture
+def backend():
+    return SQLiteOutboxBackend()
+
+def test_enqueue_deduplicates_identical_deliveries(backend):
+    outbox = Outbox(backend)
+
+    assert outbox.enqueue(WEBHOOK, {"content": "hello"}, [100, 200])
+    assert not outbox.enqueue(WEBHOOK, {"content": "hello"}, [100, 200])
+    assert outbox.enqueue(WEBHOOK, {"content": "hello"}, [100, 300])
+    assert outbox.enqueue(OTHER_WEBHOOK, {"content": "hello"}, [100, 200])
+    assert len(backend.due(int(time.time()), 10)) == 3
+
+def test_dedup_key_ignores_payload_key_order():
+    assert make_dedup_key(WEBHOOK, {"a": 1, "b": 2}, [1]) == make_dedup_key(WEBHOOK, {"b": 2, "a": 1}, [1])
+    assert make_dedup_key(WEBHOOK, {"a": 1}, [1]) != make_dedup_key(OTHER_WEBHOOK, {"a": 1}, [1])
+
+def test_due_filters_by_webhook_and_time(backend):
+    outbox = Outbox(backend)
+    outbox.enqueue(WEBHOOK, {"content": "one"}, [1])
+    outbox.enqueue(OTHER_WEBHOOK, {"content": "two"}, [2])
+    now = int(time.time())
+
+    assert [entry['webhook_url'] for entry in backend.due(now, 10, WEBHOOK)] == [WEBHOOK]
+    assert backend.due(now - 60, 10) == []
+
+def test_an_entry_is_claimed_once(backend):
+    Outbox(backend).enqueue(WEBHOOK, {"content": "one"}, [1])
+    entry = backend.due(int(time.time()), 10)[0]
+
+    assert backend.claim(entry, entry['next_attempt_at'] + 120)
+    # A second worker holding the same snapshot of the entry loses the race
+    assert not backend.claim(entry, entry['next_attempt_at'] + 120)
+    assert backend.due(int(time.time()), 10) == []
+
+def test_drain_sends_and_records_status(backend):
+    outbox = Outbox(backend)
+    outbox.enqueue(WEBHOOK, {"content": "one"}, [1])
+    engine = RecordingEngine()
+
+    stats = outbox.drain(engine)
+
+    assert stats == {"sent": 1, "retried": 0, "failed": 0}
+    assert engine.sent == [(WEBHOOK, {"content": "one"})]
+    dedup_key = make_dedup_key(WEBHOOK, {"content": "one"}, [1])
+    assert backend.get(dedup_key)['status'] == OUTBOX_SENT
+    # A sent entry is neither due again nor re-queued by a duplicate enqueue
+    assert not outbox.enqueue(WEBHOOK, {"content": "one"}, [1])
+    assert outbox.drain(engine) == {"sent": 0, "retried": 0, "failed": 0}
+
+def test_drain_reschedules_retryable_failures(backend):
+    outbox = Outbox(backend)
+    outbox.enqueue(WEBHOOK, {"content": "one"}, [1])
+    before = int(time.time())
+
+    stats = outbox.drain(RecordingEngine(DeliveryResult(False, 429, 1, 42.0, "Rate limited", True)))
+
+    assert stats == {"sent": 0, "retried": 1, "failed": 0}
+    entry = backend.get(make_dedup_key(WEBHOOK, {"content": "one"}, [1]))
+    assert entry['status'] == OUTBOX_PENDING
+    assert entry['attempts'] == 1
+    assert entry['next_attempt_at'] >= before + 42
+    assert entry['last_error'] == "Rate limited"
+
+def test_drain_gives_up_on_permanent_failures_and_after_max_attempts(backend):
+    outbox = Outbox(backend, max_attempts=2, base_delay=0)
+    outbox.enqueue(WEBHOOK, {"content": "gone"}, [1])
+    outbox.enqueue(WEBHOOK, {"content": "flaky"}, [2])
+
+    # Without a delay the retried entry is due again within the same drain
+    stats = outbox.drain(RecordingEngine(
+        DeliveryResult(False, 404, 1, None, "Unknown Webhook", False),
+        DeliveryResult(False, 500, 1, None, "Server error", True),
+        DeliveryResult(False, 500, 1, None, "Server error", True)
+    ))
+
+    assert stats == {"sent": 0, "retried": 1, "failed": 2}
+    assert backend.get(make_dedup_key(WEBHOOK, {"content": "gone"}, [1]))['status'] == OUTBOX_FAILED
+    assert backend.get(make_dedup_key(WEBHOOK, {"content": "flaky"}, [2]))['attempts'] == 2
+
+def test_drain_for_one_webhook_leaves_the_others(backend):
+    outbox = Outbox(backend)
+    outbox.enqueue(WEBHOOK, {"content": "mine"}, [1])
+    outbox.enqueue(OTHER_WEBHOOK, {"content": "theirs"}, [1])
+    engine = RecordingEngine()
+
+    outbox.drain(engine, webhook_url=WEBHOOK)
+
+    assert engine.sent == [(WEBHOOK, {"content": "mine"})]
+    assert [entry['webhook_url'] for entry in backend.due(int(time.time()), 10)] == [OTHER_WEBHOOK]
@@ -0,0 +1,105 @@
+import copy
+
+import pytest
+
+from rules_schema import MAX_RULES, RulesSchema
+
+STAGES = ["stage-a", "stage-b", "stage-c"]
+MODES = ["mode-zones", "mode-tower"]
+
+@pytest.fixture
+def schema():
+    return RulesSchema(STAGES, MODES)
+
+def make_rule(**overrides):
+    rule = {
+        "notificationMessage": "@here Zones on good maps",
+        "matchType": "Open",
+        "timeSlots": ["08:00Z", "00:00Z", "08:00Z"],
+        "battleModes": {"mode-zones": True, "mode-tower": False},
+        "maps": {
+            "mode-zones": {"notifyType": "at-least-one", "selectedMaps": ["stage-c", "stage-a", "stage-c"]},
+            "mode-tower": {"notifyType": "two-same-rotation", "selectedMaps": ["stage-b"]}
+        }
+    }
+    rule.update(overrides)
+    return rule
+
+def make_payload(*rules):
+    return {"webhookUrl": "https://discord.com/api/webhooks/1/token", "rules": list(rules) or [make_rule()]}
+
+def test_valid_payload_is_canonicalized(schema):
+    is_valid, message, rules = schema.validate(make_payload())
+
+    assert is_valid, message
+    assert rules == [{
+        "notificationMessage": "@here Zones on good maps",
+        "matchType": "Open",
+        "timeSlots": ["00:00Z", "08:00Z"],
+        "battleModes": {"mode-zones": True},
+        "maps": {"mode-zones": {"notifyType": "at-least-one", "selectedMaps": ["stage-a", "stage-c"]}}
+    }]
+
+def test_canonical_rules_validate_to_themselves(schema):
+    _is_valid, _message, rules = schema.validate(make_payload())
+
+    assert schema.validate_rules(copy.deepcopy(rules)) == (True, "Rules are valid.", rules)
+
+def test_enabled_mode_without_maps_is_dropped(schema):
+    rule = make_rule(battleModes={"mode-zones": True, "mode-tower": True})
+    del rule["maps"]["mode-tower"]
+
+    is_valid, _message, rules = schema.validate(make_payload(rule))
+
+    assert is_valid
+    assert list(rules[0]["battleModes"]) == ["mode-zones"]
+
+def test_rule_order_is_kept(schema):
+    first = make_rule(notificationMessage="first")
+    second = make_rule(notificationMessage="second")
+
+    _is_valid, _message, rules = schema.validate(make_payload(first, second))
+
+    assert [rule["notificationMessage"] for rule in rules] == ["first", "second"]
+
+@pytest.mark.parametrize("payload, error", [
+    ([], "Payload must be a dictionary."),
+    ({"rules": []}, "webhookUrl is required"),
+    ({"webhookUrl": "https://x/" + "a" * 600, "rules": []}, "webhookUrl cannot exceed"),
+    ({"webhookUrl": "https://x/"}, "rules is required"),
+    ({"webhookUrl": "https://x/", "rules": [make_rule()] * (MAX_RULES + 1)}, "rules cannot have more than"),
+    ({"webhookUrl": "https://x/", "rules": ["rule"]}, "Rule at index 0 must be a dictionary."),
+])
+def test_invalid_payloads_are_rejected(schema, payload, error):
+    is_valid, message, rules = schema.validate(payload)
+
+    assert not is_valid
+    assert rules is None
+    assert error in message
+
+@pytest.mark.parametrize("overrides, error", [
+    ({"notificationMessage": "   "}, "notificationMessage in rule 0 is required"),
+    ({"notificationMessage": "x" * 301}, "notificationMessage in rule 0 cannot exceed"),
+    ({"matchType": "Private"}, "matchType in rule 0"),
+    ({"timeSlots": "08:00Z"}, "timeSlots in rule 0 is required"),
+    ({"timeSlots": ["09:00Z"]}, "timeSlots[0] in rule 0 is invalid"),
+    ({"timeSlots": ["00:00Z"] * 13}, "timeSlots in rule 0 cannot have more than 12"),
+    ({"battleModes": {"mode-clams": True}}, "battleModes key 'mode-clams' in rule 0 is not a known battle mode."),
+    ({"battleModes": {"mode-zones": "yes"}}, "must be a boolean"),
+    ({"maps": {"mode-clams": {"notifyType": "at-least-one", "selectedMaps": []}}}, "maps key 'mode-clams'"),
+    ({"maps": {"mode-zones": {"notifyType": "sometimes", "selectedMaps": []}}}, "notifyType for map 'mode-zones'"),
+    ({"maps": {"mode-zones": {"notifyType": "at-least-one", "selectedMaps": ["stage-z"]}}}, "must only contain known stage ids"),
+    ({"maps": {"mode-zones": {"notifyType": "at-least-one", "selectedMaps": ["stage-a"] * 4}}}, "cannot have more than 3 entries"),
+])
+def test_invalid_rules_are_rejected(schema, overrides, error):
+    is_valid, message, rules = schema.validate(make_payload(make_rule(**overrides)))
+
+    assert not is_valid
+    assert rules is None
+    assert error in message
+
+def test_bundled_catalogs_load():
+    schema = RulesSchema.from_catalogs()
+
+    assert "VnNSdWxlLTE=" in schema.mode_ids
+    assert "VnNTdGFnZS0x" in schema.stage_ids
@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+from schedule_history import HistoryIndex, LocalHistoryStore, ScheduleHistory, archive_started_nodes, dates_between, start_slot
+
+DAY = 24 * 3600
+HOUR = 3600
+# 2025-01-01T00:00:00Z
+MIDNIGHT = 1_735_689_600
+
+def make_node(start, match_type="Open", rule_id="rule-zones", stage_ids=("stage-a", "stage-b")):
+    return [start, start + 2 * HOUR, match_type, rule_id, list(stage_ids)]
+
+def make_snapshot(nodes, version=1):
+    return {
+        "version": version,
+        "rules": {"rule-zones": "Splat Zones", "rule-tower": "Tower Control"},
+        "stages": {"stage-a": "Stage A", "stage-b": "Stage B", "stage-c": "Stage C"},
+        "nodes": sorted(nodes, key=lambda node: node[0], reverse=True)
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalHistoryStore(str(tmp_path))
+
+def read_index(store):
+    return json.loads(store.read("history/index.json"))
+
+def test_dates_between_lists_every_touched_day():
+    assert dates_between(MIDNIGHT, MIDNIGHT + 1) == ["2025-01-01"]
+    assert dates_between(MIDNIGHT - 1, MIDNIGHT + DAY) == ["2024-12-31", "2025-01-01"]
+    assert dates_between(MIDNIGHT + HOUR, MIDNIGHT + 2 * DAY + HOUR) == ["2025-01-01", "2025-01-02", "2025-01-03"]
+
+def test_only_started_rotations_are_archived_once(store):
+    nodes = [make_node(MIDNIGHT + hour * HOUR) for hour in range(0, 24, 2)]
+    snapshot = make_snapshot(nodes)
+
+    assert archive_started_nodes(store, snapshot, MIDNIGHT + 5 * HOUR) == 3
+    # A run within the same rotation has nothing new to archive
+    assert archive_started_nodes(store, snapshot, MIDNIGHT + 5 * HOUR + 60) == 0
+    assert archive_started_nodes(store, snapshot, MIDNIGHT + 9 * HOUR) == 2
+
+    index = read_index(store)
+    assert index["archivedThrough"] == MIDNIGHT + 8 * HOUR
+    assert len(index["partitions"]["2025-01-01"]) == 2
+    loaded = ScheduleHistory(store).load(MIDNIGHT, MIDNIGHT + DAY)
+    assert [node[0] for node in loaded["nodes"]] == [MIDNIGHT + hour * HOUR for hour in (8, 6, 4, 2, 0)]
+    assert loaded["rules"]["rule-zones"] == "Splat Zones"
+
+def test_a_finished_day_is_merged_into_one_object(store):
+    nodes = [make_node(MIDNIGHT + hour * HOUR) for hour in range(0, 48, 2)]
+    snapshot = make_snapshot(nodes)
+
+    archive_started_nodes(store, snapshot, MIDNIGHT + 3 * HOUR)
+    archive_started_nodes(store, snapshot, MIDNIGHT + 13 * HOUR)
+    archive_started_nodes(store, snapshot, MIDNIGHT + 23 * HOUR)
+    # Crossing midnight archives into the new day and merges the finished one
+    archive_started_nodes(store, snapshot, MIDNIGHT + DAY + HOUR)
+
+    partitions = read_index(store)["partitions"]
+    assert partitions["2025-01-01"] == [f"history/nodes/2025-01-01/day-{MIDNIGHT + DAY + HOUR}.ndjson"]
+    assert len(partitions["2025-01-02"]) == 1
+    loaded = ScheduleHistory(store).load(MIDNIGHT, MIDNIGHT + 2 * DAY)
+    assert [node[0] for node in reversed(loaded["nodes"])] == [MIDNIGHT + hour * HOUR for hour in range(0, 25, 2)]
+
+def test_a_late_append_is_merged_under_a_new_key(store):
+    history = ScheduleHistory(store)
+    archive_started_nodes(store, make_snapshot([make_node(MIDNIGHT), make_node(MIDNIGHT + 2 * HOUR)]), MIDNIGHT + 3 * HOUR)
+    archive_started_nodes(store, make_snapshot([]), MIDNIGHT + DAY + HOUR)
+    first_key = read_index(store)["partitions"]["2025-01-01"][0]
+    # A warm reader caches the merged day
+    assert len(history.load(MIDNIGHT, MIDNIGHT + DAY)["nodes"]) == 2
+
+    # A rotation of the finished day that no earlier run saw
+    late = make_node(MIDNIGHT + 22 * HOUR)
+    archive_started_nodes(store, make_snapshot([late]), MIDNIGHT + DAY + 2 * HOUR)
+
+    second_key = read_index(store)["partitions"]["2025-01-01"][0]
+    assert second_key != first_key
+    assert json.loads(store.read(first_key).splitlines()[0])[0] == MIDNIGHT
+    assert [node[0] for node in history.load(MIDNIGHT, MIDNIGHT + DAY)["nodes"]] == [late[0], MIDNIGHT + 2 * HOUR, MIDNIGHT]
+
+def test_a_snapshot_version_change_is_refused(store):
+    archive_started_nodes(store, make_snapshot([make_node(MIDNIGHT)]), MIDNIGHT + HOUR)
+
+    with pytest.raises(ValueError):
+        archive_started_nodes(store, make_snapshot([make_node(MIDNIGHT + 2 * HOUR)], version=2), MIDNIGHT + 3 * HOUR)
+
+def test_load_without_an_archive_is_empty(store):
+    assert ScheduleHistory(store).load(MIDNIGHT, MIDNIGHT + DAY)["nodes"] == []
+
+def test_load_trims_to_the_window(store):
+    nodes = [make_node(MIDNIGHT + hour * HOUR) for hour in range(0, 24, 2)]
+    archive_started_nodes(store, make_snapshot(nodes), MIDNIGHT + DAY)
+
+    loaded = ScheduleHistory(store).load(MIDNIGHT + 4 * HOUR, MIDNIGHT + 10 * HOUR)
+
+    assert [node[0] for node in loaded["nodes"]] == [MIDNIGHT + hour * HOUR for hour in (8, 6, 4)]
+
+def brute_force(nodes, start, end, match_type=None, rule_id=None, stage_id=None, slot=None):
+    return sorted((
+        node for node in nodes
+        if start <= node[0] < end
+        and match_type in (None, node[2])
+        and rule_id in (None, node[3])
+        and (stage_id is None or stage_id in node[4])
+        and slot in (None, start_slot(node[0]))
+    ), key=lambda node: node[0])
+
+@pytest.fixture
+def nodes():
+    nodes = []
+    for step in range(7 * 12):
+        start = MIDNIGHT + step * 2 * HOUR
+        nodes.append(make_node(start, "Open", ("rule-zones", "rule-tower")[step % 2], (("stage-a", "stage-b"), ("stage-b", "stage-c"), ("stage-c", "stage-a"))[step % 3]))
+        nodes.append(make_node(start, "Series", "rule-tower", ("stage-a", "stage-c")))
+    return nodes
+
+@pytest.mark.parametrize("criteria", [
+    {},
+    {"match_type": "Open"},
+    {"match_type": "Open", "rule_id": "rule-tower", "stage_id": "stage-a"},
+    {"match_type": "Series", "stage_id": "stage-b"},
+    {"rule_id": "rule-zones", "slot": "04:00Z"},
+    {"stage_id": "stage-c", "slot": "22:00Z", "match_type": "Open"},
+])
+def test_query_combines_criteria_within_a_range(nodes, criteria):
+    index = HistoryIndex(nodes)
+    start, end = MIDNIGHT + DAY + 3 * HOUR, MIDNIGHT + 5 * DAY
+
+    assert index.query(start, end, **criteria) == brute_force(nodes, start, end, **criteria)
+    assert index.query(**criteria) == brute_force(nodes, 0, MIDNIGHT + 8 * DAY, **criteria)
+
+def test_query_snapshot_keeps_names_and_orders_newest_first(store, nodes):
+    archive_started_nodes(store, make_snapshot(nodes), MIDNIGHT + 8 * DAY)
+
+    index = ScheduleHistory(store).index(MIDNIGHT, MIDNIGHT + 2 * DAY)
+    snapshot = index.query_snapshot(match_type="Open", stage_id="stage-b", slot="02:00Z")
+
+    assert snapshot["version"] == 1
+    assert snapshot["stages"]["stage-b"] == "Stage B"
+    assert [node[0] for node in snapshot["nodes"]] == [node[0] for node in reversed(brute_force(
+        nodes, MIDNIGHT, MIDNIGHT + 2 * DAY, match_type="Open", stage_id="stage-b", slot="02:00Z"
+    ))]
+    assert snapshot["nodes"]
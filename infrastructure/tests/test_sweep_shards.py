@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import sweep_shards
+from sweep_shards import SHARD_DONE, SHARD_FAILED, SHARD_LEASED, SHARD_PENDING, ShardCoordinator, SQLiteLeaseBackend
+
+SWEEP_ID = "sweep-2025-01-01T00"
+TIMESTAMP = "2025-01-01T20:00:00+00:00"
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_700_000_000)
+    monkeypatch.setattr(sweep_shards.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def coordinator(clock):
+    return ShardCoordinator(SQLiteLeaseBackend(), lease_seconds=330, max_attempts=2)
+
+def statuses(coordinator):
+    return [record['status'] for record in coordinator.backend.list(SWEEP_ID)]
+
+def test_start_is_idempotent(coordinator):
+    assert coordinator.start(SWEEP_ID, 3, TIMESTAMP) == 3
+    assert coordinator.start(SWEEP_ID, 3, TIMESTAMP) == 0
+    assert statuses(coordinator) == [SHARD_PENDING] * 3
+
+def test_a_leased_shard_is_not_claimed_twice(coordinator):
+    coordinator.start(SWEEP_ID, 2, TIMESTAMP)
+
+    first = coordinator.claim(SWEEP_ID, "worker-1")
+    second = coordinator.claim(SWEEP_ID, "worker-2")
+
+    assert (first['shard'], first['owner'], first['attempts']) == (0, "worker-1", 1)
+    assert (second['shard'], second['owner']) == (1, "worker-2")
+    assert coordinator.claim(SWEEP_ID, "worker-3") is None
+    assert statuses(coordinator) == [SHARD_LEASED] * 2
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_cannot_report(coordinator, clock):
+    coordinator.start(SWEEP_ID, 1, TIMESTAMP)
+    stale = coordinator.claim(SWEEP_ID, "crashed-worker")
+
+    clock.now += 329
+    assert coordinator.claim(SWEEP_ID, "worker-2") is None
+    clock.now += 1
+    fresh = coordinator.claim(SWEEP_ID, "worker-2")
+
+    assert fresh['attempts'] == 2
+    assert not coordinator.complete(stale, {"subscribers": 1})
+    assert coordinator.complete(fresh, {"subscribers": 5})
+    assert statuses(coordinator) == [SHARD_DONE]
+
+def test_failed_shard_is_retried_until_max_attempts(coordinator):
+    coordinator.start(SWEEP_ID, 1, TIMESTAMP)
+
+    assert coordinator.fail(coordinator.claim(SWEEP_ID, "worker-1"), "boom")
+    assert statuses(coordinator) == [SHARD_PENDING]
+    assert coordinator.fail(coordinator.claim(SWEEP_ID, "worker-2"), "boom again")
+    assert statuses(coordinator) == [SHARD_FAILED]
+    assert coordinator.claim(SWEEP_ID, "worker-3") is None
+    assert coordinator.backend.list(SWEEP_ID)[0]['last_error'] == "boom again"
+
+def test_run_worker_processes_every_shard_and_reports_progress(coordinator):
+    coordinator.start(SWEEP_ID, 3, TIMESTAMP)
+    calls = []
+    failures = {1}
+
+    def process_shard(shard, shard_count, timestamp):
+        calls.append((shard, shard_count, timestamp))
+        if shard in failures:
+            failures.discard(shard)
+            raise RuntimeError("transient")
+        return {"subscribers": 10 + shard, "note": "ignored"}
+
+    processed = coordinator.run_worker(SWEEP_ID, "worker-1", process_shard)
+    progress = coordinator.progress(SWEEP_ID)
+
+    assert sorted(processed) == [0, 1, 2]
+    assert len(calls) == 4
+    assert all(shard_count == 3 and timestamp == TIMESTAMP for _shard, shard_count, timestamp in calls)
+    assert progress == {"shards": 3, SHARD_PENDING: 0, SHARD_LEASED: 0, SHARD_DONE: 3, SHARD_FAILED: 0, "stats": {"subscribers": 33}}
+    assert json.loads(coordinator.backend.list(SWEEP_ID)[2]['stats']) == {"subscribers": 12, "note": "ignored"}
+
+def test_run_worker_stops_at_the_deadline(coordinator, clock):
+    coordinator.start(SWEEP_ID, 2, TIMESTAMP)
+
+    assert coordinator.run_worker(SWEEP_ID, "worker-1", lambda *args: {}, deadline=clock.now) == []
+    assert statuses(coordinator) == [SHARD_PENDING] * 2
@@ -411,6 +411,65 @@ document.getElementById('main-submit-button').addEventListener('click', async (e
     }
 });
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Shows which upcoming rotations the current rules would announce, without submitting them
+document.getElementById('preview-button').addEventListener('click', async (event) => {
+    event.preventDefault();
+
+    const previewButton = event.currentTarget;
+    const originalButtonText = previewButton.textContent;
+    const responseDiv = document.getElementById('response');
+
+    previewButton.textContent = 'Loading Preview...';
+    previewButton.disabled = true;
+
+    try {
+        const apiUrl = "https://api-splat-notifyer.splatpass.net";
+        const response = await fetch(`${apiUrl}/preview-rules`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ rules: collectFormData().rules }),
+        });
+
+        const result = await response.json();
+        if (response.ok) {
+            let html = `<span style="font-family: 'BlitzBold', sans-serif;">Upcoming matches:</span>`;
+            result.rules.forEach((rule, index) => {
+                html += `<h3>Notification Rule #${index + 1}</h3>`;
+                if (rule.rotations.length === 0) {
+                    html += `<p>No upcoming rotations match this rule.</p>`;
+                    return;
+                }
+                html += `<ul>`;
+                rule.rotations.forEach(rotation => {
+                    const start = new Date(rotation.start * 1000).toLocaleString();
+                    html += `<li>${escapeHtml(start)}: ${escapeHtml(rotation.stages.join(', '))} ${escapeHtml(rotation.rule)} (${escapeHtml(rotation.matchType)})</li>`;
+                });
+                html += `</ul>`;
+            });
+            responseDiv.innerHTML = html;
+        } else {
+            responseDiv.innerHTML = `<span style="color: red;"><span style="font-family: 'BlitzBold', sans-serif;">Could not preview these rules:</span> ${escapeHtml(result.message || '')}</span>`;
+        }
+        responseDiv.style.display = 'block';
+        responseDiv.scrollIntoView({ behavior: 'smooth' });
+    } catch (error) {
+        responseDiv.innerHTML = `<span style="color: red;"><span style="font-family: 'BlitzBold', sans-serif;">Network error:</span> ${escapeHtml(error.message)}</span>`;
+        responseDiv.style.display = 'block';
+        console.error('Network error:', error);
+    } finally {
+        previewButton.textContent = originalButtonText;
+        previewButton.disabled = false;
+    }
+});
+
 function collectFormData() {
     const data = {
         webhookUrl: document.getElementById('webhook-url').value,